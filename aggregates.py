@@ -0,0 +1,91 @@
+import threading
+from collections import Counter
+
+COURSES = ("1", "2", "3", "4")
+STATUSES = ("studying", "graduated", "expelled", "academic_leave")
+
+
+class StudentStatistics:
+    """Счетчики статистики студентов, которые обновляются при каждом изменении.
+
+    Подключается к хранилищу через JsonStore.add_index(): добавление,
+    изменение и удаление карточки меняют счетчики за O(1), а готовый
+    ответ для /api/students/statistics собирается только после изменений.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.total = 0
+        self.by_course = Counter()
+        self.by_status = Counter()
+        self.institutions = Counter()
+        self.skills = Counter()
+        self.course_status = Counter()
+        self._snapshot = None
+
+    # ---------- обновление ----------
+
+    def rebuild(self, records):
+        with self._lock:
+            self._reset()
+            for record in records:
+                self._count(record, 1)
+
+    def update(self, old, new):
+        with self._lock:
+            if old is not None:
+                self._count(old, -1)
+            if new is not None:
+                self._count(new, 1)
+            self._snapshot = None
+
+    def _count(self, record, delta):
+        course = str(record.get('course', ''))
+        status = record.get('status', 'studying')
+        self.total += delta
+        self._add(self.by_course, course, delta)
+        self._add(self.by_status, status, delta)
+        self._add(self.course_status, (course, status), delta)
+        if record.get('institution'):
+            self._add(self.institutions, record['institution'], delta)
+        for skill in record.get('skills') or []:
+            self._add(self.skills, skill, delta)
+
+    @staticmethod
+    def _add(counter, key, delta):
+        counter[key] += delta
+        if counter[key] <= 0:
+            del counter[key]
+
+    # ---------- ответ ----------
+
+    def snapshot(self, extended=False, top_skills=20):
+        """Статистика в формате /api/students/statistics.
+
+        extended добавляет частоту навыков (top_skills самых частых)
+        и распределение курс x статус.
+        """
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = {
+                    "total": self.total,
+                    "byCourse": {course: self.by_course[course] for course in COURSES},
+                    "byStatus": {status: self.by_status[status] for status in STATUSES},
+                    "institutions": list(self.institutions)
+                }
+            if not extended:
+                return self._snapshot
+
+            result = dict(self._snapshot)
+            result["skills"] = [
+                {"skill": skill, "count": count}
+                for skill, count in self.skills.most_common(top_skills)
+            ]
+            result["byCourseStatus"] = {
+                course: {status: self.course_status[(course, status)] for status in STATUSES}
+                for course in COURSES
+            }
+            return result
@@ -0,0 +1,108 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s'
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """Обработчик, который только кладет запись в очередь.
+
+    В поток вывода пишет отдельный поток (QueueListener), поэтому обработчик
+    запроса не ждет stdout. Если очередь заполнена, запись отбрасывается
+    и учитывается в dropped. После fork (воркеры gunicorn, пул обработки
+    фотографий) поток вывода запускается заново в новом процессе.
+    """
+
+    def __init__(self, target, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.target = target
+        self.dropped = 0
+        self._pid = None
+        self._listener = None
+        self._start_lock = threading.Lock()
+        self._ensure_listener()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # Очередь родительского процесса могла остаться с чужими записями
+            self.queue = queue.Queue(self.queue.maxsize)
+            self._listener = logging.handlers.QueueListener(self.queue, self.target)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Дописать оставшиеся записи и остановить поток вывода"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+
+class RequestSampler:
+    """Решает, писать ли строку о запросе.
+
+    Первые per_second запросов в каждую секунду пишутся все, дальше -
+    случайная доля sample_rate. Ошибки и медленные запросы пишутся всегда.
+    """
+
+    def __init__(self, per_second=50, sample_rate=0.01, slow_ms=1000):
+        self.per_second = per_second
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self._window = 0
+        self._count = 0
+
+    def should_log(self, status, duration_ms):
+        if status >= 400 or duration_ms >= self.slow_ms:
+            return True
+        window = int(time.monotonic())
+        if window != self._window:
+            self._window = window
+            self._count = 0
+        self._count += 1
+        if self._count <= self.per_second:
+            return True
+        return random.random() < self.sample_rate
+
+
+_handler = None
+
+
+def setup_logging(level='INFO', stream=None):
+    """Настроить корневой логгер: уровень и неблокирующий вывод через очередь"""
+    global _handler
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _handler is not None:
+        return _handler
+
+    target = logging.StreamHandler(stream or sys.stderr)
+    target.setFormatter(logging.Formatter(LOG_FORMAT))
+    _handler = AsyncQueueHandler(target)
+    root.handlers = [_handler]
+    atexit.register(shutdown_logging)
+    return _handler
+
+
+def shutdown_logging():
+    """Дописать оставшиеся записи (при завершении процесса)"""
+    if _handler is not None:
+        _handler.stop()
@@ -0,0 +1,154 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Какие файлы имеет смысл сжимать заранее
+COMPRESSIBLE = ('.html', '.css', '.js', '.svg', '.json', '.txt', '.ico')
+MIN_COMPRESS_SIZE = 512
+
+# Ссылки на локальные файлы в HTML: href="style.css", src="/images/favicon.ico"
+_REFERENCE_RE = re.compile(r'((?:href|src)=")([^"#?:]+)(")')
+
+
+class Asset:
+    """Файл из public/ в памяти: хэш содержимого и сжатые варианты"""
+
+    def __init__(self, path, body):
+        self.path = path
+        self.digest = hashlib.sha256(body).hexdigest()[:10]
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.variants = {'identity': body}
+        if path.endswith(COMPRESSIBLE) and len(body) >= MIN_COMPRESS_SIZE:
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.variants['gzip'] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body)
+                if len(compressed) < len(body):
+                    self.variants['br'] = compressed
+
+    @property
+    def hashed_path(self):
+        """Путь с хэшем содержимого: script.js -> script.1a2b3c4d5e.js"""
+        name, ext = os.path.splitext(self.path)
+        return f"{name}.{self.digest}{ext}"
+
+    def choose(self, accept_encodings):
+        """Выбрать вариант по Accept-Encoding: (кодировка, тело)"""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accept_encodings[encoding]:
+                return encoding, self.variants[encoding]
+        return 'identity', self.variants['identity']
+
+
+class AssetManifest:
+    """Манифест статических файлов, который строится при запуске без сборки.
+
+    Каждый файл доступен по обычному пути и по пути с хэшем содержимого.
+    Ссылки в HTML заменяются на пути с хэшем, поэтому такие файлы можно
+    кэшировать навсегда. Если файлы на диске изменились, манифест
+    пересобирается (проверка не чаще раза в check_interval секунд).
+    """
+
+    def __init__(self, root, exclude=(), check_interval=1.0):
+        self.root = root
+        self.exclude = tuple(path.rstrip('/') + '/' for path in exclude)
+        self.check_interval = check_interval
+        self._assets = {}
+        self._hashed = {}
+        self._stamps = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self.build()
+
+    def _scan(self):
+        """Относительные пути файлов и их (mtime, размер)"""
+        stamps = {}
+        for directory, dirs, files in os.walk(self.root):
+            # Исключенные каталоги (загрузки) не обходим вовсе
+            base = os.path.relpath(directory, self.root).replace(os.sep, '/')
+            base = '' if base == '.' else base + '/'
+            dirs[:] = [name for name in dirs if not (base + name + '/').startswith(self.exclude)]
+            for name in files:
+                full_path = os.path.join(directory, name)
+                path = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                if path.startswith(self.exclude) or name.startswith('.'):
+                    continue
+                try:
+                    st = os.stat(full_path)
+                except OSError:
+                    continue
+                stamps[path] = (st.st_mtime_ns, st.st_size)
+        return stamps
+
+    def build(self):
+        with self._lock:
+            stamps = self._scan()
+            assets = {}
+            pages = []
+            for path in stamps:
+                with open(os.path.join(self.root, path), 'rb') as f:
+                    body = f.read()
+                if path.endswith('.html'):
+                    pages.append((path, body))
+                else:
+                    assets[path] = Asset(path, body)
+
+            # HTML собираем последним: в нем уже нужны хэши остальных файлов
+            for path, body in pages:
+                assets[path] = Asset(path, self._rewrite(path, body, assets))
+
+            self._assets = assets
+            self._hashed = {asset.hashed_path: asset for asset in assets.values()}
+            self._stamps = stamps
+            self._checked_at = time.monotonic()
+            logger.info("📦 Статические файлы: %s в манифесте", len(assets))
+
+    @staticmethod
+    def _rewrite(page_path, body, assets):
+        base = os.path.dirname(page_path)
+
+        def replace(match):
+            reference = match.group(2)
+            if reference.startswith('/'):
+                path = reference.lstrip('/')
+            else:
+                path = os.path.normpath(os.path.join(base, reference)).replace(os.sep, '/')
+            asset = assets.get(path)
+            if asset is None:
+                return match.group(0)
+            hashed = reference[:len(reference) - len(os.path.basename(reference))] + \
+                os.path.basename(asset.hashed_path)
+            return f"{match.group(1)}{hashed}{match.group(3)}"
+
+        return _REFERENCE_RE.sub(replace, body.decode('utf-8')).encode('utf-8')
+
+    def _refresh(self):
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        self._checked_at = time.monotonic()
+        if self._scan() != self._stamps:
+            self.build()
+
+    def get(self, path):
+        """Файл по пути: (Asset, запрошен ли путь с хэшем) или (None, False)"""
+        self._refresh()
+        asset = self._hashed.get(path)
+        if asset is not None:
+            return asset, True
+        asset = self._assets.get(path)
+        if asset is not None:
+            return asset, False
+        return None, False
@@ -0,0 +1,435 @@
+"""Нагрузочные замеры API на синтетических данных.
+
+    python bench.py                                  # 1k и 10k, тестовый клиент и gunicorn
+    python bench.py --sizes 1000,10000,100000 --transport gunicorn --duration 30
+    python bench.py --mix search --storage sqlite
+
+Для каждого размера данных создается временная папка с data/ и public/,
+приложение запускается в отдельном процессе (тестовый клиент Flask) или
+как настоящий gunicorn. Сценарии: page_load (список + статистика),
+search (поиск с задержкой ввода), filter, login, create_update, upload
+и их смесь mixed. По каждому запросу считаются пропускная способность
+и p50/p95/p99, результаты сохраняются в JSON (bench_results/), чтобы
+сравнивать прогоны между собой. Данные создает generate_data.py
+(тот же seed - тот же набор).
+"""
+import argparse
+import http.client
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import quote
+
+from generate_data import (COMMON_SKILLS, INSTITUTIONS, MALE_NAMES, STUDENT_PASSWORD, SURNAMES,
+                           DatasetGenerator)
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Вес сценариев в смеси mixed
+MIXED_WEIGHTS = {
+    'page_load': 30,
+    'search': 30,
+    'filter': 20,
+    'login': 5,
+    'create_update': 10,
+    'upload': 5
+}
+
+SEARCH_WORDS = ['иван', 'мария', 'python', 'react', 'колледж', 'данных', 'java', 'дизайн']
+
+
+# ---------- данные ----------
+
+def prepare_workdir(size, seed, storage):
+    """Временная папка приложения: data/ с синтетикой и копия public/"""
+    workdir = tempfile.mkdtemp(prefix=f'bench_{size}_')
+    shutil.copytree(os.path.join(REPO_DIR, 'public'), os.path.join(workdir, 'public'),
+                    ignore=shutil.ignore_patterns('uploads'))
+    subprocess.run([sys.executable, os.path.join(REPO_DIR, 'generate_data.py'), str(size),
+                    '--seed', str(seed), '--storage', storage], cwd=workdir,
+                   env=app_env(storage, workdir), check=True, stdout=subprocess.DEVNULL)
+    usernames = [user['username'] for user in DatasetGenerator(size, seed).users()
+                 if user['role'] == 'student']
+    return workdir, usernames
+
+
+def app_env(storage, workdir):
+    env = dict(os.environ)
+    env.update({
+        'STORAGE_MODE': storage,
+        'LOG_LEVEL': 'WARNING',
+        'METRICS_DIR': os.path.join(workdir, 'data', 'metrics'),
+        'PYTHONPATH': REPO_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    })
+    return env
+
+
+def sample_photo():
+    """Небольшая JPEG-фотография для сценария upload"""
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (1200, 900), (90, 120, 200)).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+# ---------- транспорт ----------
+
+class TestClientTransport:
+    """Запросы через тестовый клиент Flask внутри процесса"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json_body=None, files=None):
+        kwargs = {}
+        if json_body is not None:
+            kwargs['json'] = json_body
+        if files is not None:
+            kwargs['data'] = {name: (io.BytesIO(content), filename)
+                              for name, (filename, content) in files.items()}
+            kwargs['content_type'] = 'multipart/form-data'
+        response = self.client.open(path, method=method, **kwargs)
+        return response.status_code, response.get_data()
+
+
+class HttpTransport:
+    """Запросы к настоящему серверу по HTTP (keep-alive, cookie сессии)"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.cookie = None
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+
+    def request(self, method, path, json_body=None, files=None):
+        headers = {'Accept-Encoding': 'identity'}
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif files is not None:
+            boundary = uuid.uuid4().hex
+            parts = []
+            for name, (filename, content) in files.items():
+                parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+                             f'filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n'
+                             .encode('utf-8') + content + b'\r\n')
+            body = b''.join(parts) + f'--{boundary}--\r\n'.encode('utf-8')
+            headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+
+        for attempt in range(2):
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # Сервер закрыл keep-alive соединение - открываем новое
+                self.connection.close()
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+                if attempt:
+                    raise
+        cookie = response.getheader('Set-Cookie')
+        if cookie and cookie.startswith('session='):
+            self.cookie = cookie.split(';', 1)[0]
+        return response.status, data
+
+
+# ---------- сценарии ----------
+
+class Scenarios:
+    """Действия пользователя; каждый запрос записывается в recorder"""
+
+    def __init__(self, transport, recorder, rnd, usernames, photo):
+        self.transport = transport
+        self.recorder = recorder
+        self.rnd = rnd
+        self.usernames = usernames
+        self.photo = photo
+        self.admin = False
+
+    def call(self, name, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            status, body = self.transport.request(method, path, **kwargs)
+        except Exception:
+            status, body = 599, b''
+        self.recorder.record(name, time.perf_counter() - started, status)
+        return status, body
+
+    def page_load(self):
+        self.call('GET /api/students', 'GET', '/api/students?limit=48&fields=id,name,course,status,'
+                  'description,institution,skills,photo,updatedAt,userId')
+        self.call('GET /api/students/statistics', 'GET', '/api/students/statistics')
+
+    def search(self):
+        # Поиск с задержкой ввода: запрос уходит не на каждую букву
+        word = self.rnd.choice(SEARCH_WORDS)
+        for length in sorted({min(3, len(word)), min(5, len(word)), len(word)}):
+            self.call('GET /api/students/search', 'GET',
+                      f'/api/students/search?search={quote(word[:length])}')
+
+    def filter(self):
+        course = self.rnd.choice(['all', '1', '2', '3', '4'])
+        status = self.rnd.choice(['all', 'studying', 'graduated'])
+        self.call('GET /api/students/filter', 'GET',
+                  f'/api/students/filter?course={course}&status={status}')
+
+    def login(self):
+        username = self.rnd.choice(self.usernames) if self.usernames else 'admin'
+        self.call('POST /api/login', 'POST', '/api/login',
+                  json_body={'username': username, 'password': STUDENT_PASSWORD})
+        self.admin = False
+
+    def _login_admin(self):
+        if not self.admin:
+            self.call('POST /api/login', 'POST', '/api/login',
+                      json_body={'username': 'admin', 'password': 'admin123'})
+            self.admin = True
+
+    def create_update(self):
+        self._login_admin()
+        status, body = self.call('POST /api/students', 'POST', '/api/students', json_body={
+            'name': f"{self.rnd.choice(MALE_NAMES)} {self.rnd.choice(SURNAMES)}",
+            'course': self.rnd.randint(1, 4),
+            'description': 'Студент из нагрузочного теста',
+            'institution': self.rnd.choice(INSTITUTIONS),
+            'skills': self.rnd.sample(COMMON_SKILLS, 2)
+        })
+        if status == 201:
+            student_id = json.loads(body)['id']
+            self.call('PUT /api/students/<id>', 'PUT', f'/api/students/{student_id}',
+                      json_body={'status': 'graduated', 'skills': 'Python, SQL'})
+
+    def upload(self):
+        status, body = self.call('POST /api/upload-photo', 'POST', '/api/upload-photo',
+                                 files={'photo': ('photo.jpg', self.photo)})
+        if status == 202:
+            status_url = json.loads(body)['statusUrl']
+            for _ in range(100):
+                status, body = self.call('GET /api/upload-photo/<file>/status', 'GET', status_url)
+                if status != 200 or json.loads(body).get('status') != 'pending':
+                    break
+                time.sleep(0.05)
+
+    def run(self, mix):
+        if mix == 'mixed':
+            mix = self.rnd.choices(list(MIXED_WEIGHTS), weights=list(MIXED_WEIGHTS.values()))[0]
+        getattr(self, mix)()
+
+
+class Recorder:
+    """Время ответов по именам запросов"""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, status):
+        with self._lock:
+            self.samples.setdefault(name, []).append(seconds)
+            if status >= 400:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def merge(self, other):
+        for name, samples in other.samples.items():
+            self.samples.setdefault(name, []).extend(samples)
+        for name, count in other.errors.items():
+            self.errors[name] = self.errors.get(name, 0) + count
+
+
+def percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, int(round(fraction * len(sorted_samples))) - 1))
+    return sorted_samples[index]
+
+
+def summarize(recorder, elapsed):
+    result = {}
+    for name in sorted(recorder.samples):
+        samples = sorted(recorder.samples[name])
+        result[name] = {
+            "count": len(samples),
+            "errors": recorder.errors.get(name, 0),
+            "rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(samples, 0.99) * 1000, 3)
+        }
+    return result
+
+
+def drive(make_transport, mix, duration, concurrency, usernames, seed):
+    """Гонять сценарий mix в concurrency потоках duration секунд"""
+    photo = sample_photo() if mix in ('upload', 'mixed') else None
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+
+    def client(number):
+        scenarios = Scenarios(make_transport(), recorder, random.Random(seed + number), usernames, photo)
+        while time.monotonic() < deadline:
+            scenarios.run(mix)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.monotonic() - started
+
+
+# ---------- запуск приложения ----------
+
+def _client_worker(workdir, storage, mix, duration, concurrency, usernames, seed, results):
+    os.chdir(workdir)
+    os.environ.update(app_env(storage, workdir))
+    sys.path.insert(0, REPO_DIR)
+    import server
+    recorder, elapsed = drive(lambda: TestClientTransport(server.app), mix, duration,
+                              concurrency, usernames, seed)
+    # Процессы пула фотографий иначе не дадут дочернему процессу завершиться
+    server.photo_processor.shutdown()
+    results.put((recorder.samples, recorder.errors, elapsed))
+
+
+def run_test_client(workdir, storage, mix, duration, concurrency, usernames, seed):
+    """Приложение в отдельном процессе, запросы через тестовый клиент"""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_client_worker, args=(
+        workdir, storage, mix, duration, concurrency, usernames, seed, results))
+    process.start()
+    samples, errors, elapsed = results.get()
+    process.join()
+    recorder = Recorder()
+    recorder.samples, recorder.errors = samples, errors
+    return recorder, elapsed
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_gunicorn(workdir, storage, mix, duration, concurrency, usernames, seed, workers):
+    """Настоящий gunicorn на свободном порту, запросы по HTTP"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '--threads', '4',
+         '-b', f'127.0.0.1:{port}', 'server:app'],
+        cwd=workdir, env=app_env(storage, workdir),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 120
+        while True:
+            try:
+                status, _ = HttpTransport('127.0.0.1', port).request('GET', '/api/health/ready')
+                if status == 200:
+                    break
+            except OSError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("gunicorn не запустился")
+            time.sleep(0.2)
+        return drive(lambda: HttpTransport('127.0.0.1', port), mix, duration,
+                     concurrency, usernames, seed)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+# ---------- отчет ----------
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_table(title, summary):
+    print(f"\n{title}")
+    print(f"{'запрос':<40} {'кол-во':>8} {'ошибки':>7} {'rps':>9} {'p50 мс':>9} {'p95 мс':>9} {'p99 мс':>9}")
+    for name, row in summary.items():
+        print(f"{name:<40} {row['count']:>8} {row['errors']:>7} {row['rps']:>9.1f} "
+              f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочные замеры API")
+    parser.add_argument('--sizes', default='1000,10000',
+                        help="размеры наборов данных через запятую (например 1000,10000,100000)")
+    parser.add_argument('--transport', choices=('client', 'gunicorn', 'both'), default='both')
+    parser.add_argument('--mix', choices=list(MIXED_WEIGHTS) + ['mixed'], default='mixed')
+    parser.add_argument('--duration', type=float, default=10, help="секунд на каждый прогон")
+    parser.add_argument('--concurrency', type=int, default=8, help="параллельных клиентов gunicorn")
+    parser.add_argument('--workers', type=int, default=4, help="воркеров gunicorn")
+    parser.add_argument('--storage', choices=('journal', 'snapshot', 'sqlite'), default='journal')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="файл результатов (по умолчанию bench_results/<время>.json)")
+    parser.add_argument('--keep', action='store_true', help="не удалять временные папки")
+    args = parser.parse_args()
+
+    transports = ('client', 'gunicorn') if args.transport == 'both' else (args.transport,)
+    runs = []
+    for size in [int(value) for value in args.sizes.split(',') if value]:
+        for transport in transports:
+            workdir, usernames = prepare_workdir(size, args.seed, args.storage)
+            try:
+                if transport == 'client':
+                    # Тестовый клиент работает под GIL - один клиент, без конкуренции
+                    recorder, elapsed = run_test_client(workdir, args.storage, args.mix,
+                                                        args.duration, 1, usernames, args.seed)
+                else:
+                    recorder, elapsed = run_gunicorn(workdir, args.storage, args.mix, args.duration,
+                                                     args.concurrency, usernames, args.seed,
+                                                     args.workers)
+            finally:
+                if not args.keep:
+                    shutil.rmtree(workdir, ignore_errors=True)
+
+            summary = summarize(recorder, elapsed)
+            print_table(f"{transport}, {size} студентов, {args.mix}, {elapsed:.1f} с", summary)
+            runs.append({"size": size, "transport": transport, "elapsed": round(elapsed, 3),
+                         "endpoints": summary})
+
+    output = args.output or os.path.join(
+        REPO_DIR, 'bench_results', datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "storage": args.storage,
+            "mix": args.mix,
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "seed": args.seed,
+            "runs": runs
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Результаты сохранены: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def format_sse(event, name=None):
+    """Событие в формате Server-Sent Events, id - версия данных"""
+    data = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {event['version']}\nevent: {name or event['op']}\ndata: {data}\n\n"
+
+
+class Subscription:
+    """Очередь событий одного подключения"""
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize)
+        self.overflowed = False
+
+    def get(self, timeout):
+        """Следующее событие или None, если за timeout секунд ничего не пришло"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _overflow(self):
+        # Подписчик не успевает: события выбрасываем, вместо них - сигнал reset
+        self.overflowed = True
+        try:
+            while True:
+                self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        self.queue.put_nowait(None)
+
+
+class ChangeFeed:
+    """Лента изменений карточек, общая для всех воркеров.
+
+    Обработчик, изменивший данные, дописывает событие строкой JSON в файл
+    filename. Запись идет под блокировкой хранилища, поэтому порядок строк
+    совпадает с порядком версий. В каждом воркере один фоновый поток
+    следит за файлом и раздает новые строки очередям подписчиков.
+    Когда файл вырастает больше max_bytes, он начинается заново, а старые
+    события остаются в <filename>.1 для переподключившихся клиентов
+    (max_bytes должен быть намного больше, чем пишется за poll_interval).
+    """
+
+    def __init__(self, filename, poll_interval=0.25, max_bytes=1024 * 1024, queue_size=256):
+        self.filename = filename
+        self.previous_filename = f"{filename}.1"
+        self.poll_interval = poll_interval
+        self.max_bytes = max_bytes
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    # ---------- запись ----------
+
+    def publish(self, op, version, **fields):
+        """Дописать событие (вызывать внутри locked() хранилища)"""
+        event = dict(op=op, version=version, at=round(time.time(), 3), **fields)
+        line = json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n'
+        try:
+            os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+            if os.path.exists(self.filename) and os.path.getsize(self.filename) > self.max_bytes:
+                os.replace(self.filename, self.previous_filename)
+            with open(self.filename, 'ab') as f:
+                f.write(line.encode('utf-8'))
+        except OSError as e:
+            logger.warning("⚠️ Не удалось записать событие в %s: %s", self.filename, e)
+
+    # ---------- чтение ----------
+
+    def events_since(self, version):
+        """События с версией больше version или None, если часть уже удалена"""
+        events = []
+        for filename in (self.previous_filename, self.filename):
+            try:
+                with open(filename, 'rb') as f:
+                    lines = f.read().splitlines()
+            except OSError:
+                continue
+            for line in lines:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+        if events and events[0]['version'] > version + 1:
+            return None
+        return [event for event in events if event['version'] > version]
+
+    def subscribe(self):
+        """Новый подписчик получает события, записанные после подписки"""
+        with self._lock:
+            # Поток чтения запускается в каждом воркере отдельно (после fork)
+            if self._pid != os.getpid():
+                self._subscribers = set()
+                self._pid = os.getpid()
+                threading.Thread(target=self._tail, args=(self._pid,), daemon=True).start()
+            subscription = Subscription(self.queue_size)
+            self._subscribers.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def _open_at_end(self):
+        try:
+            f = open(self.filename, 'rb')
+        except OSError:
+            return None
+        f.seek(0, os.SEEK_END)
+        return f
+
+    def _tail(self, pid):
+        f = self._open_at_end()
+        buffer = b''
+        while self._pid == pid:
+            time.sleep(self.poll_interval)
+            if f is None:
+                # Файла еще нет - все, что в нем появится, новое
+                try:
+                    f = open(self.filename, 'rb')
+                except OSError:
+                    continue
+            chunk = f.read()
+            try:
+                rotated = os.stat(self.filename).st_ino != os.fstat(f.fileno()).st_ino
+            except OSError:
+                rotated = False
+            if rotated:
+                # Дочитываем старый файл и переходим на новый с начала
+                chunk += f.read()
+                f.close()
+                try:
+                    f = open(self.filename, 'rb')
+                except OSError:
+                    f = None
+            if not chunk:
+                continue
+
+            buffer += chunk
+            end = buffer.rfind(b'\n') + 1
+            lines, buffer = buffer[:end].splitlines(), buffer[end:]
+            events = []
+            for line in lines:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    logger.warning("⚠️ Пропущена поврежденная строка ленты %s", self.filename)
+            self._dispatch(events)
+
+    def _dispatch(self, events):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            for event in events:
+                try:
+                    subscription.queue.put_nowait(event)
+                except queue.Full:
+                    subscription._overflow()
+                    self.unsubscribe(subscription)
+                    break
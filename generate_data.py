@@ -0,0 +1,268 @@
+"""Генерация синтетических студентов и пользователей.
+
+    python generate_data.py 10000                     # в хранилище STORAGE_MODE
+    python generate_data.py 100000 --storage sqlite --seed 7
+    python generate_data.py 1000 --photos 0.3         # 30% карточек с фотографиями
+
+Данные похожи на настоящие: русские имена, несколько популярных колледжей
+и много редких, навыки по направлениям (частые встречаются чаще), курсы
+и статусы с правдоподобным соотношением, часть карточек привязана
+к учетным записям студентов. Записи создаются по одной и сразу пишутся
+на диск, поэтому в памяти не держится весь набор. Результат зависит
+только от --seed и количества: студент с данным id всегда одинаковый.
+"""
+import argparse
+import hashlib
+import os
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from repository import STORAGE_MODES, open_students, open_users
+
+MALE_NAMES = ['Александр', 'Максим', 'Иван', 'Артем', 'Дмитрий', 'Никита', 'Михаил', 'Даниил',
+              'Егор', 'Андрей', 'Кирилл', 'Илья', 'Алексей', 'Роман', 'Сергей', 'Владислав',
+              'Ярослав', 'Тимофей', 'Матвей', 'Павел', 'Глеб', 'Денис', 'Евгений', 'Степан']
+FEMALE_NAMES = ['Анастасия', 'Мария', 'Анна', 'Виктория', 'Екатерина', 'Дарья', 'Полина',
+                'Елизавета', 'Ксения', 'Александра', 'Софья', 'Алина', 'Вероника', 'Арина',
+                'Валерия', 'Ольга', 'Юлия', 'Татьяна', 'Елена', 'Кристина', 'Ульяна', 'Алёна']
+SURNAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов',
+            'Михайлов', 'Новиков', 'Федоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев',
+            'Семенов', 'Егоров', 'Павлов', 'Козлов', 'Степанов', 'Николаев', 'Орлов',
+            'Андреев', 'Макаров', 'Никитин', 'Захаров', 'Зайцев', 'Соловьёв', 'Борисов',
+            'Яковлев', 'Григорьев', 'Романов', 'Воробьёв', 'Сергеев', 'Кириллов', 'Белов',
+            'Тарасов', 'Беляев', 'Комаров', 'Ковалевский', 'Жуковский', 'Шевченко', 'Ким']
+
+# Колледжи в порядке популярности (частота убывает по закону Ципфа)
+INSTITUTIONS = [
+    'Колледж информационных технологий №1', 'Технический колледж', 'Политехнический колледж',
+    'Колледж связи №54', 'Колледж программирования и кибербезопасности',
+    'Московский колледж цифровой экономики', 'Колледж автоматизации и информационных технологий',
+    'Колледж современных технологий', 'Радиотехнический колледж', 'Колледж предпринимательства №11',
+    'Колледж архитектуры и дизайна', 'Колледж электроники и приборостроения',
+    'Колледж туризма и гостиничного сервиса', 'Колледж малого бизнеса №4',
+    'Колледж железнодорожного транспорта', 'Строительный колледж №26'
+]
+
+# Направления: (вес, описание, навыки в порядке популярности)
+TRACKS = {
+    'backend': (30, 'Backend-разработчик', ['Python', 'SQL', 'PostgreSQL', 'Django', 'Java',
+                                            'FastAPI', 'Go', 'Spring', 'Redis', 'C#']),
+    'frontend': (25, 'Frontend-разработчик', ['JavaScript', 'HTML', 'CSS', 'React', 'TypeScript',
+                                              'Vue', 'Sass', 'Webpack', 'Angular', 'Next.js']),
+    'data': (15, 'Data Science', ['Python', 'Pandas', 'NumPy', 'SQL', 'Scikit-learn',
+                                  'Matplotlib', 'PyTorch', 'Jupyter', 'TensorFlow', 'Spark']),
+    'design': (12, 'UI/UX-дизайнер', ['Figma', 'Photoshop', 'Illustrator', 'Adobe XD',
+                                      'Прототипирование', 'Tilda', 'Blender']),
+    'mobile': (10, 'Мобильный разработчик', ['Kotlin', 'Swift', 'Flutter', 'Dart', 'Android',
+                                             'React Native', 'Java']),
+    'devops': (8, 'DevOps-инженер', ['Linux', 'Docker', 'Git', 'Bash', 'Kubernetes', 'Nginx',
+                                     'Ansible', 'CI/CD'])
+}
+COMMON_SKILLS = ['Git', 'English B1', 'Linux', 'Jira', 'Английский язык', '1С']
+
+INTERESTS = ['увлекается олимпиадным программированием', 'участвует в хакатонах',
+             'делает пет-проекты', 'ищет стажировку', 'интересуется машинным обучением',
+             'пишет статьи на Хабр', 'помогает одногруппникам', 'изучает архитектуру приложений']
+
+COURSE_WEIGHTS = tuple(accumulate((30, 27, 23, 20)))
+STUDENT_PASSWORD = 'student123'
+# Дата отсчета для createdAt (фиксированная, чтобы результат зависел только от seed)
+START_DATE = datetime(2022, 9, 1)
+
+
+def _zipf_weights(count, exponent=1.1):
+    """Накопленные веса рангов 1..count для random.choices(cum_weights=...)"""
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def _female_surname(surname):
+    if surname.endswith(('ов', 'ев', 'ёв', 'ин')):
+        return surname + 'а'
+    if surname.endswith('ский'):
+        return surname[:-2] + 'ая'
+    return surname
+
+
+class DatasetGenerator:
+    """Синтетический набор из count студентов.
+
+    Каждая карточка строится из своего генератора случайных чисел
+    (seed, id), поэтому students() и users() можно обходить независимо
+    и по отдельности, не храня промежуточных данных.
+    """
+
+    def __init__(self, count, seed=42, account_share=0.6, photo_share=0.0):
+        self.count = count
+        self.seed = seed
+        self.account_share = account_share
+        self.photo_share = photo_share
+        self._institution_weights = _zipf_weights(len(INSTITUTIONS))
+        self._track_names = list(TRACKS)
+        self._track_weights = list(accumulate(TRACKS[name][0] for name in self._track_names))
+        self._skill_weights = {name: _zipf_weights(len(TRACKS[name][2]), 0.8) for name in TRACKS}
+
+    def _random(self, student_id):
+        return random.Random(self.seed * 1000003 + student_id)
+
+    def _student(self, student_id, user_id):
+        rnd = self._random(student_id)
+        rnd.random()  # учетная запись, см. _has_account
+        female = rnd.random() < 0.45
+        first_name = rnd.choice(FEMALE_NAMES if female else MALE_NAMES)
+        surname = rnd.choice(SURNAMES)
+        name = f"{first_name} {_female_surname(surname) if female else surname}"
+
+        course = rnd.choices((1, 2, 3, 4), cum_weights=COURSE_WEIGHTS)[0]
+        roll = rnd.random()
+        if course == 4 and roll < 0.35:
+            status = 'graduated'
+        elif roll > 0.96:
+            status = 'academic_leave'
+        elif roll > 0.93:
+            status = 'expelled'
+        else:
+            status = 'studying'
+
+        track = rnd.choices(self._track_names, cum_weights=self._track_weights)[0]
+        _, title, track_skills = TRACKS[track]
+        skills = []
+        for _ in range(rnd.randint(2, 6)):
+            skill = rnd.choices(track_skills, cum_weights=self._skill_weights[track])[0]
+            if skill not in skills:
+                skills.append(skill)
+        if rnd.random() < 0.3:
+            skill = rnd.choice(COMMON_SKILLS)
+            if skill not in skills:
+                skills.append(skill)
+
+        interest = rnd.choice(INTERESTS)
+        noun = 'Студентка' if female else 'Студент'
+        links = {}
+        if rnd.random() < 0.6:
+            links['github'] = f"https://github.com/student{student_id}"
+        if rnd.random() < 0.25:
+            links['portfolio'] = f"https://portfolio-{student_id}.ru"
+
+        photo = '/images/default.jpg'
+        if rnd.random() < self.photo_share:
+            photo = f"/images/uploads/{self.photo_filename(student_id)}"
+
+        created = START_DATE + timedelta(seconds=rnd.randint(0, 3 * 365 * 24 * 3600))
+        updated = created + timedelta(seconds=int(rnd.expovariate(1 / (30 * 24 * 3600))))
+        return {
+            "id": student_id,
+            "name": name,
+            "course": course,
+            "status": status,
+            "description": f"{title}, {interest}",
+            "fullInfo": f"{noun} {course} курса, изучает {', '.join(skills[:3])}.",
+            "institution": rnd.choices(INSTITUTIONS, cum_weights=self._institution_weights)[0],
+            "skills": skills,
+            "links": links,
+            "photo": photo,
+            "createdAt": created.isoformat(),
+            "updatedAt": updated.isoformat(),
+            "userId": user_id
+        }
+
+    def _has_account(self, student_id):
+        # Первое число генератора карточки - есть ли учетная запись
+        return self._random(student_id).random() < self.account_share
+
+    def _accounts(self):
+        """Пары (id студента, id пользователя или None); пользователь 1 - админ"""
+        user_id = 1
+        for student_id in range(1, self.count + 1):
+            if self._has_account(student_id):
+                user_id += 1
+                yield student_id, user_id
+            else:
+                yield student_id, None
+
+    def students(self):
+        for student_id, user_id in self._accounts():
+            yield self._student(student_id, user_id)
+
+    def users(self):
+        created = START_DATE.isoformat()
+        yield {
+            "id": 1,
+            "username": "admin",
+            "password": hashlib.sha256("admin123".encode()).hexdigest(),
+            "role": "admin",
+            "email": "admin@college.ru",
+            "createdAt": created
+        }
+        student_hash = hashlib.sha256(STUDENT_PASSWORD.encode()).hexdigest()
+        for student_id, user_id in self._accounts():
+            if user_id is None:
+                continue
+            yield {
+                "id": user_id,
+                "username": f"student{student_id}",
+                "password": student_hash,
+                "role": "student",
+                "email": f"student{student_id}@college.ru",
+                "createdAt": created
+            }
+
+    def photo_filename(self, student_id):
+        return f"generated_{self.seed}_{student_id}.jpg"
+
+    def write_photos(self, directory):
+        """Создать файлы фотографий для карточек, у которых они есть"""
+        from PIL import Image, ImageDraw
+
+        os.makedirs(directory, exist_ok=True)
+        written = 0
+        for student in self.students():
+            if not student['photo'].startswith('/images/uploads/'):
+                continue
+            path = os.path.join(directory, os.path.basename(student['photo']))
+            if not os.path.exists(path):
+                rnd = self._random(student['id'])
+                background = tuple(rnd.randint(60, 200) for _ in range(3))
+                image = Image.new('RGB', (600, 600), background)
+                draw = ImageDraw.Draw(image)
+                draw.ellipse((180, 90, 420, 330), fill=(235, 220, 200))
+                draw.ellipse((90, 360, 510, 780), fill=tuple(255 - c for c in background))
+                image.save(path, 'JPEG', quality=85)
+            written += 1
+        return written
+
+
+def generate(count, storage, seed=42, account_share=0.6, photo_share=0.0,
+             photo_dir=os.path.join('public', 'images', 'uploads')):
+    """Записать сгенерированный набор в хранилище storage (заменяет данные)"""
+    generator = DatasetGenerator(count, seed, account_share, photo_share)
+    if not open_users(storage).save_stream(generator.users()):
+        raise SystemExit("❌ Не удалось записать пользователей")
+    if not open_students(storage).save_stream(generator.students()):
+        raise SystemExit("❌ Не удалось записать студентов")
+    photos = generator.write_photos(photo_dir) if photo_share else 0
+    return generator, photos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных")
+    parser.add_argument('count', type=int, help="количество студентов")
+    parser.add_argument('--storage', choices=STORAGE_MODES,
+                        default=os.environ.get('STORAGE_MODE', 'journal'))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--accounts', type=float, default=0.6,
+                        help="доля студентов с учетной записью")
+    parser.add_argument('--photos', type=float, default=0.0,
+                        help="доля карточек со сгенерированной фотографией")
+    args = parser.parse_args()
+
+    _, photos = generate(args.count, args.storage, args.seed, args.accounts, args.photos)
+    print(f"✅ Создано карточек студентов: {args.count} ({args.storage}, seed {args.seed})")
+    if photos:
+        print(f"🖼️ Фотографий: {photos}")
+    print("\n👤 Админ: admin / admin123")
+    print(f"👨‍🎓 Студенты: student<id> / {STUDENT_PASSWORD}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+import os
+
+# Настройки gunicorn - читаются из текущего каталога: gunicorn server:app
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+
+# Поток изменений (/api/students/changes) держит соединение открытым
+# до CHANGES_STREAM_SECONDS. С потоками каждая вкладка занимает один поток,
+# а не целый воркер, и воркер не убивается по timeout посреди потока
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
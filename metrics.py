@@ -0,0 +1,240 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм времени, в секундах
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _new_histogram():
+    # Счетчики корзин (последняя - больше всех границ), сумма и количество
+    return {"buckets": [0] * (len(DURATION_BUCKETS) + 1), "sum": 0.0, "count": 0}
+
+
+def _observe(histogram, seconds):
+    histogram["buckets"][bisect_left(DURATION_BUCKETS, seconds)] += 1
+    histogram["sum"] += seconds
+    histogram["count"] += 1
+
+
+def _merge_histogram(target, source):
+    for i, value in enumerate(source["buckets"]):
+        target["buckets"][i] += value
+    target["sum"] += source["sum"]
+    target["count"] += source["count"]
+
+
+def _labels(names, values):
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class Metrics:
+    """Метрики запросов в формате Prometheus, общие для всех воркеров.
+
+    Каждый процесс считает в памяти число запросов по статусам, гистограммы
+    времени по обработчикам, запросы в работе и время отдельных операций
+    (timed). Фоновый поток раз в flush_interval секунд записывает снимок
+    в файл <directory>/metrics_<ppid>_<pid>.json, если счетчики изменились.
+    /api/metrics складывает файлы
+    всех воркеров одного запуска (одного мастер-процесса gunicorn), поэтому
+    счетчики перезапущенных воркеров не теряются.
+    """
+
+    def __init__(self, directory, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._requests = {}
+        self._durations = {}
+        self._operations = {}
+        self._in_flight = {}
+        self._dirty = False
+        self._flusher = None
+
+    def _touch(self):
+        # После fork счетчики родителя к новому воркеру не относятся,
+        # а поток записи в новом процессе нужно запустить заново
+        if self._pid != os.getpid():
+            self._reset()
+        self._dirty = True
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.flush_interval)
+            if self._dirty:
+                self.flush()
+
+    # ---------- сбор ----------
+
+    def request_started(self, endpoint):
+        with self._lock:
+            self._touch()
+            self._in_flight[endpoint] = self._in_flight.get(endpoint, 0) + 1
+
+    def request_finished(self, endpoint, method, status, seconds):
+        with self._lock:
+            self._touch()
+            self._in_flight[endpoint] = self._in_flight.get(endpoint, 1) - 1
+            key = (endpoint, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            histogram = self._durations.get((endpoint, method))
+            if histogram is None:
+                histogram = self._durations[(endpoint, method)] = _new_histogram()
+            _observe(histogram, seconds)
+
+    def observe(self, operation, seconds):
+        """Учесть время операции (поиск, сериализация, запись в хранилище...)"""
+        with self._lock:
+            self._touch()
+            histogram = self._operations.get(operation)
+            if histogram is None:
+                histogram = self._operations[operation] = _new_histogram()
+            _observe(histogram, seconds)
+
+    @contextmanager
+    def timed(self, operation):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(operation, time.perf_counter() - started)
+
+    # ---------- файлы воркеров ----------
+
+    def _filename(self, ppid, pid):
+        return os.path.join(self.directory, f"metrics_{ppid}_{pid}.json")
+
+    def _snapshot(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            self._dirty = False
+            return {
+                "requests": [list(key) + [count] for key, count in self._requests.items()],
+                "durations": [list(key) + [dict(h, buckets=list(h["buckets"]))]
+                              for key, h in self._durations.items()],
+                "operations": [[key, dict(h, buckets=list(h["buckets"]))]
+                               for key, h in self._operations.items()],
+                "in_flight": [[key, count] for key, count in self._in_flight.items()]
+            }
+
+    def flush(self):
+        """Записать снимок счетчиков процесса в его файл"""
+        filename = self._filename(os.getppid(), os.getpid())
+        tmp_filename = f"{filename}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_filename, 'w', encoding='utf-8') as f:
+                json.dump(self._snapshot(), f, ensure_ascii=False)
+            os.replace(tmp_filename, filename)
+        except OSError as e:
+            logger.warning("⚠️ Не удалось записать метрики %s: %s", filename, e)
+
+    def _collect(self):
+        """Сложить снимки всех воркеров текущего запуска"""
+        self.flush()
+        ppid = os.getppid()
+        requests, durations, operations, in_flight = {}, {}, {}, {}
+        for filename in glob.glob(os.path.join(self.directory, 'metrics_*_*.json')):
+            try:
+                file_ppid, file_pid = map(int, os.path.basename(filename)[8:-5].split('_'))
+            except ValueError:
+                continue
+            if file_ppid != ppid:
+                # Файлы прошлых запусков удаляем, когда их мастер уже завершился
+                if not _process_alive(file_ppid):
+                    try:
+                        os.remove(filename)
+                    except OSError:
+                        pass
+                continue
+            try:
+                with open(filename, encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            for *key, count in snapshot["requests"]:
+                requests[tuple(key)] = requests.get(tuple(key), 0) + count
+            for *key, histogram in snapshot["durations"]:
+                _merge_histogram(durations.setdefault(tuple(key), _new_histogram()), histogram)
+            for key, histogram in snapshot["operations"]:
+                _merge_histogram(operations.setdefault(key, _new_histogram()), histogram)
+            # Запросы в работе считаем только у живых воркеров
+            if file_pid == os.getpid() or _process_alive(file_pid):
+                for key, count in snapshot["in_flight"]:
+                    in_flight[key] = in_flight.get(key, 0) + count
+        return requests, durations, operations, in_flight
+
+    # ---------- вывод ----------
+
+    def render(self):
+        """Текст метрик в формате Prometheus"""
+        requests, durations, operations, in_flight = self._collect()
+        lines = [
+            '# HELP http_requests_total Число обработанных запросов',
+            '# TYPE http_requests_total counter'
+        ]
+        for key in sorted(requests):
+            lines.append(f'http_requests_total{_labels(("endpoint", "method", "status"), key)} '
+                         f'{requests[key]}')
+
+        lines += [
+            '# HELP http_requests_in_flight Запросы, которые обрабатываются сейчас',
+            '# TYPE http_requests_in_flight gauge'
+        ]
+        for key in sorted(in_flight):
+            lines.append(f'http_requests_in_flight{_labels(("endpoint",), (key,))} {in_flight[key]}')
+
+        lines += self._render_histograms(
+            'http_request_duration_seconds', 'Время обработки запроса',
+            ('endpoint', 'method'), durations)
+        lines += self._render_histograms(
+            'app_operation_duration_seconds', 'Время отдельных операций внутри запросов',
+            ('operation',), {(key,): value for key, value in operations.items()})
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histograms(name, description, label_names, histograms):
+        lines = [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+        for key in sorted(histograms):
+            histogram = histograms[key]
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS + ('+Inf',), histogram["buckets"]):
+                cumulative += count
+                labels = _labels(label_names + ('le',), tuple(key) + (bound,))
+                lines.append(f'{name}_bucket{labels} {cumulative}')
+            labels = _labels(label_names, key)
+            lines.append(f'{name}_sum{labels} {histogram["sum"]:.6f}')
+            lines.append(f'{name}_count{labels} {histogram["count"]}')
+        return lines
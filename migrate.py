@@ -0,0 +1,157 @@
+"""Начальное заполнение и перенос данных между хранилищами.
+
+    python migrate.py                # перенести data/*.json в SQLite (data/app.db)
+    python migrate.py --reset        # пересоздать тестовых пользователей и студентов
+
+Для --reset хранилище выбирается по STORAGE_MODE (или --storage).
+"""
+import argparse
+import hashlib
+import os
+from datetime import datetime
+
+from repository import STORAGE_MODES, open_students, open_users
+
+
+def initial_users():
+    """Тестовые пользователи (пароли в SHA256)"""
+    admin_hash = hashlib.sha256("admin123".encode()).hexdigest()
+    student_hash = hashlib.sha256("student123".encode()).hexdigest()
+
+    return [
+        {
+            "id": 1,
+            "username": "admin",
+            "password": admin_hash,
+            "role": "admin",
+            "email": "admin@college.ru",
+            "createdAt": datetime.now().isoformat()
+        },
+        {
+            "id": 2,
+            "username": "student1",
+            "password": student_hash,
+            "role": "student",
+            "email": "student1@college.ru",
+            "createdAt": datetime.now().isoformat()
+        }
+    ]
+
+
+def initial_students():
+    """Тестовые карточки студентов"""
+    return [
+        {
+            "id": 1,
+            "name": "Иван Иванов",
+            "course": 1,
+            "status": "studying",
+            "description": "Backend-разработчик, увлекается Python и SQL",
+            "fullInfo": "Студент 1 курса, изучает Python и базы данных.",
+            "institution": "Колледж информационных технологий №1",
+            "skills": ["Python", "SQL", "PostgreSQL"],
+            "links": {
+                "github": "https://github.com/ivanov",
+                "portfolio": "https://ivanov-portfolio.ru"
+            },
+            "photo": "/images/default.jpg",
+            "createdAt": datetime.now().isoformat(),
+            "updatedAt": datetime.now().isoformat(),
+            "userId": 1
+        },
+        {
+            "id": 2,
+            "name": "Мария Петрова",
+            "course": 3,
+            "status": "studying",
+            "description": "Frontend-разработчик, специалист по React",
+            "fullInfo": "Студентка 3 курса, создала несколько проектов на React.",
+            "institution": "Колледж информационных технологий №1",
+            "skills": ["JavaScript", "React", "HTML", "CSS"],
+            "links": {
+                "github": "https://github.com/maria",
+                "portfolio": "https://maria-dev.ru"
+            },
+            "photo": "/images/default.jpg",
+            "createdAt": datetime.now().isoformat(),
+            "updatedAt": datetime.now().isoformat(),
+            "userId": 2
+        },
+        {
+            "id": 3,
+            "name": "Алексей Сидоров",
+            "course": 2,
+            "status": "studying",
+            "description": "Data Science, интересуется машинным обучением",
+            "fullInfo": "Студент 2 курса, изучает Python, математику и ML.",
+            "institution": "Технический колледж",
+            "skills": ["Python", "Pandas", "NumPy", "Scikit-learn"],
+            "links": {
+                "github": "https://github.com/alexey",
+                "portfolio": "https://alexey-ds.ru"
+            },
+            "photo": "/images/default.jpg",
+            "createdAt": datetime.now().isoformat(),
+            "updatedAt": datetime.now().isoformat(),
+            "userId": None
+        }
+    ]
+
+
+def seed(users_store, students_store, reset=False):
+    """Заполнить пустые хранилища тестовыми данными (reset - перезаписать)"""
+    if reset or not users_store.exists():
+        users = initial_users()
+        users_store.save(users)
+        print(f"✅ Создано пользователей: {len(users)}")
+
+    if reset or not students_store.exists():
+        students = initial_students()
+        students_store.save(students)
+        print(f"✅ Создано карточек студентов: {len(students)}")
+
+
+def migrate_to_sqlite(force=False):
+    """Перенести пользователей и студентов из JSON-файлов в SQLite"""
+    targets = (
+        ("пользователей", open_users('journal'), open_users('sqlite')),
+        ("студентов", open_students('journal'), open_students('sqlite')),
+    )
+    for title, source, target in targets:
+        if not source.exists():
+            print(f"⚠️ Нет JSON-файла {title}: {source.filename}")
+            continue
+        if target.exists() and target.count() and not force:
+            print(f"⚠️ В базе уже есть {title}, перенос пропущен (--force для перезаписи)")
+            continue
+        # JsonStore применяет журнал изменений к снимку при загрузке
+        records = source.load()
+        if not target.save(records):
+            raise SystemExit(f"❌ Не удалось перенести {title}")
+        print(f"✅ Перенесено {title}: {len(records)}")
+
+    print(f"📦 База данных: {targets[0][2].filename}")
+    print("   Для работы с ней запустите сервер с STORAGE_MODE=sqlite")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перенос и начальное заполнение данных")
+    parser.add_argument('--reset', action='store_true',
+                        help="пересоздать тестовых пользователей и студентов")
+    parser.add_argument('--storage', choices=STORAGE_MODES,
+                        default=os.environ.get('STORAGE_MODE', 'journal'),
+                        help="хранилище для --reset")
+    parser.add_argument('--force', action='store_true',
+                        help="перезаписать данные, уже перенесенные в SQLite")
+    args = parser.parse_args()
+
+    if args.reset:
+        seed(open_users(args.storage), open_students(args.storage), reset=True)
+        print("\n👤 Админ: admin / admin123")
+        print("👨‍🎓 Студент: student1 / student123")
+    else:
+        migrate_to_sqlite(force=args.force)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+import glob
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+# Размеры производных изображений: наибольшая сторона в пикселях
+THUMBNAIL_SIZES = {
+    'grid': 400,    # карточка в сетке
+    'card': 800,    # карточка на экранах с высокой плотностью пикселей
+    'full': 1600    # просмотр фотографии
+}
+
+WEBP_SUPPORTED = features.check('webp')
+
+
+class QueueFullError(Exception):
+    """Очередь обработки фотографий переполнена"""
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# ---------- производные изображения ----------
+
+def _source_key(source_path):
+    return hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()[:16]
+
+
+def thumbnail_path(cache_dir, source_path, size, fmt='jpeg'):
+    """Путь к производному изображению в кэше.
+
+    В имя входят исходный файл, его mtime и размер, поэтому после замены
+    фотографии старая копия из кэша не используется.
+    """
+    st = os.stat(source_path)
+    stamp = hashlib.sha1(f"{st.st_mtime_ns}:{st.st_size}".encode('utf-8')).hexdigest()[:8]
+    ext = 'webp' if fmt == 'webp' else 'jpg'
+    return os.path.join(cache_dir, f"{_source_key(source_path)}-{stamp}-{size}.{ext}")
+
+
+def _save_image(img, path, fmt='jpeg'):
+    """Атомарно записать изображение: во временный файл и os.replace"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        if fmt == 'webp':
+            img.save(tmp_path, 'WEBP', quality=80, method=4)
+        else:
+            img.save(tmp_path, 'JPEG', quality=82, optimize=True, progressive=True)
+        os.replace(tmp_path, path)
+    finally:
+        _remove(tmp_path)
+
+
+def _open_reduced(fp, max_side):
+    """Открыть изображение, уменьшенное до max_side по большей стороне.
+
+    JPEG сразу декодируется в уменьшенном масштабе (draft), остальные
+    форматы уменьшаются через reduce() внутри thumbnail(). Полноцветные
+    режимы меняются уже после уменьшения, чтобы не копировать полный растр;
+    палитру и черно-белые изображения Pillow уменьшает только ближайшим
+    соседом, поэтому их переводим в полноцветный режим заранее.
+    """
+    img = Image.open(fp)
+    img.draft('RGB', (max_side, max_side))
+    if img.mode in ('P', 'PA'):
+        img = img.convert('RGBA' if img.mode == 'PA' or 'transparency' in img.info else 'RGB')
+    elif img.mode == '1':
+        img = img.convert('L')
+    img.thumbnail((max_side, max_side), reducing_gap=2.0)
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    return img
+
+
+def _drop_stale(cache_dir, source_path, path, size):
+    # Копии этого размера от прежней версии фотографии больше не нужны
+    prefix = path.rsplit('-', 1)[0]
+    for old_path in glob.glob(os.path.join(cache_dir, f"{_source_key(source_path)}-*-{size}.*")):
+        if not old_path.startswith(prefix) and not old_path.endswith('.tmp'):
+            _remove(old_path)
+
+
+def ensure_thumbnail(source_path, cache_dir, size, fmt='jpeg'):
+    """Вернуть путь к производному изображению, создав его при первом обращении"""
+    path = thumbnail_path(cache_dir, source_path, size, fmt)
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(source_path, 'rb') as f:
+            img = _open_reduced(f, THUMBNAIL_SIZES[size])
+            _save_image(img, path, fmt)
+        _drop_stale(cache_dir, source_path, path, size)
+    return path
+
+
+def remove_thumbnails(cache_dir, source_path):
+    """Удалить все производные изображения фотографии"""
+    for path in glob.glob(os.path.join(cache_dir, f"{_source_key(source_path)}-*")):
+        _remove(path)
+
+
+def make_thumbnails(source_path, cache_dir, img):
+    """Создать все размеры (и WebP, если он поддерживается) из уже
+    декодированного изображения: от большего размера к меньшему"""
+    formats = ('jpeg', 'webp') if WEBP_SUPPORTED else ('jpeg',)
+    os.makedirs(cache_dir, exist_ok=True)
+    img = img.copy()
+    for size, max_side in sorted(THUMBNAIL_SIZES.items(), key=lambda item: -item[1]):
+        img.thumbnail((max_side, max_side))
+        for fmt in formats:
+            path = thumbnail_path(cache_dir, source_path, size, fmt)
+            _save_image(img, path, fmt)
+            _drop_stale(cache_dir, source_path, path, size)
+
+
+# ---------- обработка загрузок ----------
+
+def read_photo_size(data):
+    """Размер изображения в пикселях по заголовку, без декодирования.
+
+    Для файла, который не является изображением, Pillow выбросит исключение.
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        return img.size
+
+
+def process_photo(data, target_path, max_side, thumbnail_dir=None):
+    """Обработать загруженное фото (выполняется в пуле процессов).
+
+    Изображение декодируется из памяти сразу уменьшенным до max_side,
+    один раз записывается в JPEG и атомарно заменяет target_path.
+    Если передан thumbnail_dir, из того же растра создаются производные.
+    Возвращает время обработки в секундах.
+    """
+    started = time.perf_counter()
+    tmp_path = f"{target_path}.{os.getpid()}.tmp"
+    try:
+        img = _open_reduced(io.BytesIO(data), max_side)
+        img.save(tmp_path, 'JPEG', quality=85, optimize=True)
+        os.replace(tmp_path, target_path)
+    except Exception as e:
+        # Отметку об ошибке ставим до снятия pending, чтобы статус не пропадал
+        with open(f"{target_path}.failed", 'w', encoding='utf-8') as f:
+            f.write(str(e))
+        raise
+    finally:
+        _remove(tmp_path)
+        _remove(f"{target_path}.pending")
+
+    # Фото уже доступно, уменьшенные копии создаем после снятия отметки
+    if thumbnail_dir:
+        try:
+            make_thumbnails(target_path, thumbnail_dir, img)
+        except Exception as e:
+            logger.warning("⚠️ Не удалось создать уменьшенные копии: %s", e)
+    return time.perf_counter() - started
+
+
+def _pool_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class PhotoProcessor:
+    """Обработка фотографий в отдельных процессах вне обработчика запроса.
+
+    Одновременно в очереди не больше max_queue задач - остальные загрузки
+    отклоняются (QueueFullError), чтобы не занимать воркеры. Состояние задачи
+    видно по файлам рядом с фото (<файл>.pending, <файл>.failed), поэтому его
+    может проверить любой воркер gunicorn. timer(операция, секунды) получает
+    время обработки каждого фото (для метрик).
+    """
+
+    def __init__(self, max_workers=2, max_queue=8, max_side=2048, thumbnail_dir=None, timer=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_side = max_side
+        self.thumbnail_dir = thumbnail_dir
+        self.timer = timer
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, data, target_path):
+        """Поставить фото (содержимое файла в bytes) в очередь обработки"""
+        with self._lock:
+            if self._pending >= self.max_queue:
+                raise QueueFullError("Очередь обработки фотографий переполнена")
+            # Пул создается при первой загрузке - уже внутри воркера gunicorn.
+            # В воркере работают потоки (gthread, логирование, метрики), поэтому
+            # процессы пула не форкаются от него: блокировки, занятые другими
+            # потоками в момент fork, в дочернем процессе не освободились бы
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=_pool_context())
+            _remove(f"{target_path}.failed")
+            open(f"{target_path}.pending", 'w').close()
+            future = self._executor.submit(process_photo, data, target_path,
+                                           self.max_side, self.thumbnail_dir)
+            self._pending += 1
+        future.add_done_callback(partial(self._done, target_path))
+
+    def _done(self, target_path, future):
+        with self._lock:
+            self._pending -= 1
+        error = future.exception()
+        if error is None:
+            if self.timer is not None:
+                self.timer('process_photo', future.result())
+            return
+
+        logger.error("❌ Ошибка обработки фотографии %s: %s", target_path, error)
+        with open(f"{target_path}.failed", 'w', encoding='utf-8') as f:
+            f.write(str(error))
+        _remove(f"{target_path}.pending")
+        if isinstance(error, BrokenProcessPool):
+            with self._lock:
+                self._executor = None
+
+    def queue_depth(self):
+        return self._pending
+
+    def shutdown(self, wait=True):
+        """Дождаться текущих задач и остановить процессы пула"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    @staticmethod
+    def status(target_path):
+        """Состояние фото: pending, ready, failed или None, если его нет"""
+        if os.path.exists(f"{target_path}.failed"):
+            return 'failed'
+        if os.path.exists(f"{target_path}.pending"):
+            return 'pending'
+        if os.path.exists(target_path):
+            return 'ready'
+        return None
@@ -21,9 +21,67 @@ class AdminPanel {
         // Загружаем данные если авторизованы
         if (this.currentUser) {
             await this.loadData();
+            this.subscribeChanges();
         }
     }
 
+    subscribeChanges() {
+        // Изменения из других вкладок и от других администраторов (Server-Sent Events)
+        if (!window.EventSource) return;
+        const source = new EventSource('/api/students/changes');
+        ['created', 'updated', 'deleted', 'imported', 'reset'].forEach(type => {
+            source.addEventListener(type, (event) => this.handleChange(type, JSON.parse(event.data)));
+        });
+    }
+
+    async handleChange(type, change) {
+        try {
+            const ids = change.ids || (change.id !== undefined ? [change.id] : []);
+            if (type === 'reset') {
+                await this.loadStudents();
+            } else if (type === 'deleted') {
+                this.removeStudents(ids);
+            } else {
+                const changed = type === 'imported' ? Array.from(
+                    { length: change.lastId - change.firstId + 1 }, (_, i) => change.firstId + i) : ids;
+                await this.upsertStudents(changed);
+            }
+            this.updateStats();
+        } catch (error) {
+            console.error('Ошибка применения изменений:', error);
+        }
+    }
+
+    async upsertStudents(ids) {
+        // Новые и измененные карточки - порциями по 500 (предел /api/students/batch)
+        for (let start = 0; start < ids.length; start += 500) {
+            const response = await fetch('/api/students/batch', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ ids: ids.slice(start, start + 500) })
+            });
+            if (!response.ok) throw new Error(`Ошибка ${response.status}`);
+            this.putStudents(Object.values((await response.json()).students));
+        }
+    }
+
+    putStudents(cards) {
+        // Заменяем карточки с теми же id, новые добавляем в конец таблицы
+        const byId = new Map(cards.map(student => [student.id, student]));
+        this.students = this.students.map(student => {
+            const card = byId.get(student.id);
+            byId.delete(student.id);
+            return card || student;
+        });
+        this.students.push(...byId.values());
+        this.renderStudentsTable(this.students);
+    }
+
+    removeStudents(ids) {
+        this.students = this.students.filter(student => !ids.includes(student.id));
+        this.renderStudentsTable(this.students);
+    }
+
     async checkAuth() {
         try {
             const response = await fetch('/api/current-user');
@@ -219,8 +277,27 @@ class AdminPanel {
 
     async loadStudents() {
         try {
-            const response = await fetch('/api/students');
-            this.students = await response.json();
+            // Таблице не нужны fullInfo и ссылки - запрашиваем только нужные поля,
+            // страницами по 200 записей
+            const fields = 'id,name,description,course,status,skills,photo,createdAt,updatedAt';
+            let students = [];
+            let cursor = null;
+
+            do {
+                const params = new URLSearchParams({ limit: 200, fields });
+                if (cursor) params.set('cursor', cursor);
+
+                const response = await fetch(`/api/students?${params.toString()}`, { cache: 'no-cache' });
+                if (!response.ok) {
+                    throw new Error(`Ошибка ${response.status}`);
+                }
+
+                const page = await response.json();
+                students = students.concat(page.items);
+                cursor = page.nextCursor;
+            } while (cursor);
+
+            this.students = students;
             this.renderStudentsTable(this.students);
         } catch (error) {
             console.error('Ошибка загрузки студентов:', error);
@@ -450,7 +527,8 @@ class AdminPanel {
             if (response.ok) {
                 const student = await response.json();
                 this.closeModal();
-                await this.loadStudents();
+                // Ответ - сохраненная карточка, список целиком не перезагружаем
+                this.putStudents([student]);
                 this.updateStats();
 
                 this.showNotification(
@@ -470,7 +548,7 @@ class AdminPanel {
 
     async editStudent(studentId) {
         try {
-            const response = await fetch(`/api/students/${studentId}`);
+            const response = await fetch(`/api/students/${studentId}`, { cache: 'no-cache' });
             if (response.ok) {
                 const student = await response.json();
                 this.openStudentModal(student);
@@ -521,7 +599,7 @@ class AdminPanel {
             });
 
             if (response.ok) {
-                await this.loadStudents();
+                this.removeStudents([studentId]);
                 this.updateStats();
                 this.showNotification('Студент успешно удален', 'success');
             } else {
@@ -11,6 +11,16 @@ class StudentSystem {
         this.currentStatus = 'all';
         this.currentInstitution = 'all';
         this.statistics = null;
+
+        // Постраничная загрузка: сервер отдает компактные карточки порциями
+        this.pageSize = 48;
+        this.cardFields = 'id,name,course,status,description,institution,skills,photo,updatedAt,userId';
+        this.totalStudents = 0;
+        this.filteredTotal = 0;
+        this.studentsCursor = null;
+        this.nextCursor = null;
+        this.currentQuery = null;
+
         this.init();
     }
 
@@ -20,6 +30,107 @@ class StudentSystem {
         await this.checkAuth();
         await this.loadStatistics();
         await this.loadStudents();
+        this.subscribeChanges();
+    }
+
+    subscribeChanges() {
+        // Изменения других пользователей приходят с сервера (Server-Sent Events)
+        if (!window.EventSource) return;
+        const source = new EventSource('/api/students/changes');
+        ['created', 'updated', 'deleted', 'imported', 'reset'].forEach(type => {
+            source.addEventListener(type, (event) => this.handleChange(type, JSON.parse(event.data)));
+        });
+    }
+
+    handleChange(type, change) {
+        const ids = change.ids || (change.id !== undefined ? [change.id] : []);
+        if (type === 'reset' || (type === 'imported' && change.count > this.pageSize)) {
+            // Пропущенные изменения восстановить нельзя (или их слишком много) - список заново
+            this.loadStudents();
+        } else if (type === 'deleted') {
+            this.students = this.students.filter(student => !ids.includes(student.id));
+            this.filteredStudents = this.filteredStudents.filter(student => !ids.includes(student.id));
+            this.totalStudents = Math.max(this.totalStudents - ids.length, 0);
+            this.filteredTotal = Math.max(this.filteredTotal - ids.length, 0);
+            this.renderStudents();
+            this.updateStats();
+        } else if (type === 'updated') {
+            const shown = ids.filter(id => this.filteredStudents.some(student => student.id === id));
+            if (shown.length) this.refreshCards(shown);
+        } else if (type === 'created' || type === 'imported') {
+            const created = type === 'created' ? ids : Array.from(
+                { length: change.lastId - change.firstId + 1 }, (_, i) => change.firstId + i);
+            if (created.length) this.addCards(created);
+        }
+
+        // Статистику перезагружаем не чаще раза в секунду
+        clearTimeout(this.statisticsTimer);
+        this.statisticsTimer = setTimeout(() => this.loadStatistics(), 1000);
+    }
+
+    async fetchCards(ids) {
+        const response = await fetch(`/api/students/batch?ids=${ids.join(',')}`, { cache: 'no-cache' });
+        if (!response.ok) throw new Error(`Ошибка ${response.status}`);
+        return (await response.json()).students;
+    }
+
+    matchesQuery(student) {
+        // Те же условия, что у поиска и фильтра на сервере
+        if (!this.currentQuery) return false;
+        const { path, params } = this.currentQuery;
+        const course = params.get('course');
+        if (course && String(student.course) !== course) return false;
+        const status = params.get('status');
+        if (status && student.status !== status) return false;
+        const institution = params.get('institution');
+        const studentInstitution = student.institution || '';
+        if (institution && (path === '/api/students/search'
+            ? !studentInstitution.toLowerCase().includes(institution.toLowerCase())
+            : studentInstitution !== institution)) return false;
+        const search = params.get('search');
+        if (search) {
+            const texts = [student.name, student.description, studentInstitution, ...(student.skills || [])];
+            if (!texts.some(text => (text || '').toLowerCase().includes(search))) return false;
+        }
+        return true;
+    }
+
+    async addCards(ids) {
+        try {
+            const cards = Object.values(await this.fetchCards(ids));
+            this.totalStudents += cards.length;
+            const matching = cards.filter(student => this.matchesQuery(student));
+            this.filteredTotal += matching.length;
+
+            // Новые карточки в конце списка: показываем, если он уже загружен до конца
+            if (!this.nextCursor) {
+                this.filteredStudents = [...this.filteredStudents, ...matching];
+                if (this.currentQuery && this.currentQuery.path === '/api/students') {
+                    this.students = this.filteredStudents;
+                }
+            }
+            this.renderStudents();
+            this.updateStats();
+        } catch (error) {
+            console.error('Ошибка загрузки новых карточек:', error);
+        }
+    }
+
+    async refreshCards(ids) {
+        try {
+            const cards = await this.fetchCards(ids);
+            const replace = (list) => list.map(student => cards[student.id] || student);
+            this.students = replace(this.students);
+            // Карточка, которая больше не подходит под поиск или фильтр, из выдачи уходит
+            const before = this.filteredStudents.length;
+            this.filteredStudents = replace(this.filteredStudents).filter(student =>
+                !cards[student.id] || this.matchesQuery(student));
+            this.filteredTotal -= before - this.filteredStudents.length;
+            this.renderStudents();
+            this.updateStats();
+        } catch (error) {
+            console.error('Ошибка обновления карточек:', error);
+        }
     }
 
     async loadStudents() {
@@ -32,16 +143,14 @@ class StudentSystem {
                 </div>
             `;
 
-            const response = await fetch('/api/students');
-
-            if (!response.ok) {
-                throw new Error(`Ошибка ${response.status}: ${response.statusText}`);
-            }
+            const page = await this.fetchStudentsPage('/api/students');
 
-            this.students = await response.json();
-            this.filteredStudents = [...this.students];
+            this.students = page.items;
+            this.totalStudents = page.total;
+            this.studentsCursor = page.nextCursor;
+            this.applyPage('/api/students', new URLSearchParams(), page);
 
-            console.log(`✅ Загружено ${this.students.length} студентов`);
+            console.log(`✅ Загружено ${this.students.length} из ${this.totalStudents} студентов`);
 
             // Находим карточку текущего пользователя
             if (this.currentUser) {
@@ -63,9 +172,55 @@ class StudentSystem {
         }
     }
 
+    async fetchStudentsPage(path, params = new URLSearchParams(), cursor = null) {
+        const query = new URLSearchParams(params);
+        query.set('limit', this.pageSize);
+        query.set('fields', this.cardFields);
+        if (cursor) query.set('cursor', cursor);
+
+        const response = await fetch(`${path}?${query.toString()}`, { cache: 'no-cache' });
+
+        if (!response.ok) {
+            throw new Error(`Ошибка ${response.status}: ${response.statusText}`);
+        }
+
+        return response.json();
+    }
+
+    applyPage(path, params, page) {
+        this.filteredStudents = page.items;
+        this.filteredTotal = page.total;
+        this.nextCursor = page.nextCursor;
+        this.currentQuery = { path, params };
+    }
+
+    async loadMoreStudents() {
+        if (!this.nextCursor || !this.currentQuery) return;
+
+        try {
+            const { path, params } = this.currentQuery;
+            const page = await this.fetchStudentsPage(path, params, this.nextCursor);
+
+            this.filteredStudents = [...this.filteredStudents, ...page.items];
+            this.filteredTotal = page.total;
+            this.nextCursor = page.nextCursor;
+
+            // Догружаем и основной список, если показан он
+            if (path === '/api/students') {
+                this.students = this.filteredStudents;
+                this.studentsCursor = this.nextCursor;
+            }
+
+            this.renderStudents();
+        } catch (error) {
+            console.error('Ошибка загрузки студентов:', error);
+            this.showNotification('Не удалось загрузить студентов', 'error');
+        }
+    }
+
     async loadStatistics() {
         try {
-            const response = await fetch('/api/students/statistics');
+            const response = await fetch('/api/students/statistics', { cache: 'no-cache' });
             if (response.ok) {
                 this.statistics = await response.json();
                 this.updateStatisticsUI();
@@ -120,13 +275,8 @@ class StudentSystem {
             if (statusValue !== 'all') params.append('status', statusValue);
             if (institutionValue !== 'all') params.append('institution', institutionValue);
 
-            const response = await fetch(`/api/students/search?${params.toString()}`);
-
-            if (!response.ok) {
-                throw new Error('Ошибка поиска');
-            }
-
-            this.filteredStudents = await response.json();
+            const page = await this.fetchStudentsPage('/api/students/search', params);
+            this.applyPage('/api/students/search', params, page);
             this.renderStudents();
             this.updateSearchInfo();
 
@@ -152,13 +302,8 @@ class StudentSystem {
             if (statusValue !== 'all') params.append('status', statusValue);
             if (institutionValue !== 'all') params.append('institution', institutionValue);
 
-            const response = await fetch(`/api/students/filter?${params.toString()}`);
-
-            if (!response.ok) {
-                throw new Error('Ошибка фильтрации');
-            }
-
-            this.filteredStudents = await response.json();
+            const page = await this.fetchStudentsPage('/api/students/filter', params);
+            this.applyPage('/api/students/filter', params, page);
             this.currentFilter = course;
 
             // Обновляем активные кнопки фильтров
@@ -193,13 +338,8 @@ class StudentSystem {
             if (status !== 'all') params.append('status', status);
             if (institutionValue !== 'all') params.append('institution', institutionValue);
 
-            const response = await fetch(`/api/students/filter?${params.toString()}`);
-
-            if (!response.ok) {
-                throw new Error('Ошибка фильтрации');
-            }
-
-            this.filteredStudents = await response.json();
+            const page = await this.fetchStudentsPage('/api/students/filter', params);
+            this.applyPage('/api/students/filter', params, page);
             this.renderStudents();
             this.updateFilterInfo();
 
@@ -224,13 +364,8 @@ class StudentSystem {
             if (statusValue !== 'all') params.append('status', statusValue);
             if (institution !== 'all') params.append('institution', institution);
 
-            const response = await fetch(`/api/students/filter?${params.toString()}`);
-
-            if (!response.ok) {
-                throw new Error('Ошибка фильтрации');
-            }
-
-            this.filteredStudents = await response.json();
+            const page = await this.fetchStudentsPage('/api/students/filter', params);
+            this.applyPage('/api/students/filter', params, page);
             this.renderStudents();
             this.updateFilterInfo();
 
@@ -296,10 +431,11 @@ class StudentSystem {
                     }
 
                     <div class="card-img-container">
-                        <img src="${getPhotoUrl(student.photo)}"
+                        <img ${this.photoAttributes(getPhotoUrl(student.photo), '(max-width: 768px) 100vw, 400px')}
                              alt="${student.name}"
                              class="card-img loaded"
-                             onerror="this.src='/images/default.jpg'">
+                             loading="lazy"
+                             onerror="this.removeAttribute('srcset'); this.src='/images/default.jpg'">
                         <div class="img-placeholder">
                             <i class="fas fa-user-graduate"></i>
                         </div>
@@ -362,15 +498,25 @@ class StudentSystem {
                 </div>
             `;
         }).join('');
+
+        if (this.nextCursor) {
+            container.innerHTML += `
+                <div class="load-more">
+                    <button class="retry-btn" onclick="window.studentSystem.loadMoreStudents()">
+                        <i class="fas fa-chevron-down"></i> Показать еще (${this.filteredTotal - this.filteredStudents.length})
+                    </button>
+                </div>
+            `;
+        }
     }
 
     updateStats() {
-        const total = this.filteredStudents.length;
+        const total = this.filteredTotal;
         const totalElement = document.getElementById('total-count');
         const footerElement = document.getElementById('footer-count');
 
         if (totalElement) totalElement.textContent = total;
-        if (footerElement) footerElement.textContent = this.students.length;
+        if (footerElement) footerElement.textContent = this.totalStudents;
     }
 
     updateStatisticsUI() {
@@ -422,7 +568,7 @@ class StudentSystem {
         const institutionSelect = document.getElementById('institution-filter');
         const institutionValue = institutionSelect ? institutionSelect.value : 'all';
 
-        let infoText = `Найдено студентов: ${this.filteredStudents.length}`;
+        let infoText = `Найдено студентов: ${this.filteredTotal}`;
 
         if (searchValue) {
             infoText += ` • Поиск: "${searchValue}"`;
@@ -456,7 +602,7 @@ class StudentSystem {
     }
 
     updateFilterInfo() {
-        let infoText = `Показано студентов: ${this.filteredStudents.length}`;
+        let infoText = `Показано студентов: ${this.filteredTotal}`;
 
         if (this.currentFilter !== 'all') {
             infoText += ` • Курс: ${this.currentFilter}`;
@@ -595,14 +741,18 @@ class StudentSystem {
         if (institutionFilter) institutionFilter.value = 'all';
 
         // Загрузка всех студентов
-        this.filteredStudents = [...this.students];
+        this.applyPage('/api/students', new URLSearchParams(), {
+            items: [...this.students],
+            total: this.totalStudents,
+            nextCursor: this.studentsCursor
+        });
         this.renderStudents();
 
         const filterInfo = document.getElementById('filter-info');
         if (filterInfo) {
             filterInfo.innerHTML = `
                 <i class="fas fa-info-circle"></i>
-                <span id="filter-text">Показаны все студенты (${this.students.length})</span>
+                <span id="filter-text">Показаны все студенты (${this.totalStudents})</span>
             `;
         }
 
@@ -928,6 +1078,11 @@ class StudentSystem {
             if (response.ok) {
                 const result = await response.json();
                 photoUrlInput.value = result.photoUrl;
+                if (result.status === 'pending') {
+                    // Фото обрабатывается на сервере, дожидаемся готовности
+                    this.showNotification('Фото загружено, идет обработка...', 'info');
+                    await this.waitForPhoto(result.statusUrl);
+                }
                 this.showNotification('Фото успешно загружено!', 'success');
             } else {
                 const error = await response.json();
@@ -940,11 +1095,29 @@ class StudentSystem {
         }
     }
 
+    async waitForPhoto(statusUrl, timeout = 30000) {
+        const started = Date.now();
+        while (Date.now() - started < timeout) {
+            const response = await fetch(statusUrl, { cache: 'no-cache' });
+            if (response.ok) {
+                const result = await response.json();
+                if (result.status === 'ready') return;
+                if (result.status === 'failed') {
+                    throw new Error('Не удалось обработать фото');
+                }
+            } else if (response.status === 404) {
+                throw new Error('Фото не найдено');
+            }
+            await new Promise(resolve => setTimeout(resolve, 500));
+        }
+        throw new Error('Обработка фото заняла слишком много времени');
+    }
+
     // ========== МОДАЛЬНОЕ ОКНО РЕДАКТИРОВАНИЯ ==========
 
     async openEditModal(studentId) {
         try {
-            const response = await fetch(`/api/students/${studentId}`);
+            const response = await fetch(`/api/students/${studentId}`, { cache: 'no-cache' });
             if (!response.ok) {
                 throw new Error('Студент не найден');
             }
@@ -1149,8 +1322,18 @@ class StudentSystem {
 
     // ========== МОДАЛЬНОЕ ОКНО ПРОСМОТРА ==========
 
-    openViewModal(studentId) {
-        const student = this.students.find(s => s.id === studentId);
+    async openViewModal(studentId) {
+        // В списке только компактные карточки - полную запись запрашиваем отдельно
+        let student = null;
+        try {
+            const response = await fetch(`/api/students/${studentId}`, { cache: 'no-cache' });
+            if (response.ok) {
+                student = await response.json();
+            }
+        } catch (error) {
+            console.error('Ошибка загрузки карточки:', error);
+        }
+
         if (!student) {
             this.showNotification('Студент не найден', 'error');
             return;
@@ -1210,10 +1393,10 @@ class StudentSystem {
                         <div class="student-profile">
                             <div class="profile-header">
                                 <div class="profile-photo-container">
-                                    <img src="${getPhotoUrl(student.photo)}"
+                                    <img ${this.photoAttributes(getPhotoUrl(student.photo), '120px')}
                                          alt="${student.name}"
                                          class="profile-photo"
-                                         onerror="this.src='/images/default.jpg'">
+                                         onerror="this.removeAttribute('srcset'); this.src='/images/default.jpg'">
                                     <div class="photo-placeholder">
                                         <i class="fas fa-user-graduate"></i>
                                     </div>
@@ -1490,8 +1673,13 @@ class StudentSystem {
     }
 
     async confirmDeleteStudent(studentId) {
-        const student = this.students.find(s => s.id === studentId);
-        if (!student) return;
+        let student = this.filteredStudents.find(s => s.id === studentId) ||
+            this.students.find(s => s.id === studentId);
+        if (!student) {
+            const response = await fetch(`/api/students/${studentId}`, { cache: 'no-cache' });
+            if (!response.ok) return;
+            student = await response.json();
+        }
 
         const isMyCard = student.userId === this.currentUser?.id;
         const message = isMyCard
@@ -1532,7 +1720,7 @@ class StudentSystem {
         }
 
         try {
-            const response = await fetch(`/api/students/${studentId}`);
+            const response = await fetch(`/api/students/${studentId}`, { cache: 'no-cache' });
 
             if (!response.ok) {
                 throw new Error('Студент не найден');
@@ -1560,6 +1748,14 @@ class StudentSystem {
 
     // ========== УВЕДОМЛЕНИЯ И ОШИБКИ ==========
 
+    // Локальные фотографии отдаются уменьшенными копиями нужного размера
+    photoAttributes(url, sizes) {
+        if (!url.startsWith('/images/')) return `src="${url}"`;
+        const path = url.slice('/images/'.length);
+        const srcset = `/thumbs/grid/${path} 400w, /thumbs/card/${path} 800w, /thumbs/full/${path} 1600w`;
+        return `src="/thumbs/grid/${path}" srcset="${srcset}" sizes="${sizes}"`;
+    }
+
     showNotification(message, type = 'info') {
         const notification = document.createElement('div');
         notification.className = `notification notification-${type}`;
@@ -0,0 +1,285 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left, insort
+
+# Вес совпадения в поле: имя важнее навыков, навыки - описания, описание - учреждения
+FIELD_WEIGHTS = (('name', 4.0), ('skills', 3.0), ('description', 2.0), ('institution', 1.0))
+# Множитель веса для слова, которое только начинается с запроса
+PREFIX_FACTOR = 0.8
+# Множитель веса для слова с опечатками: индекс - расстояние правки
+TYPO_FACTORS = (1.0, 0.6, 0.4)
+# Наибольшее число опечаток (см. max_typos) и длина начала слова,
+# по которому строится индекс удалений
+MAX_TYPOS = len(TYPO_FACTORS) - 1
+PREFIX_LENGTH = 7
+# Сколько разобранных слов запроса помнить
+EXPANSION_CACHE_SIZE = 1024
+
+_WORD = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Нижний регистр и е вместо ё - для индекса и для запроса"""
+    return (text or '').lower().replace('ё', 'е')
+
+
+def tokenize(text):
+    return _WORD.findall(normalize(text))
+
+
+def max_typos(word):
+    """Сколько опечаток допускается в слове запроса такой длины"""
+    if len(word) <= 3:
+        return 0
+    return 1 if len(word) <= 7 else 2
+
+
+def bounded_distance(a, b, limit):
+    """Расстояние Дамерау-Левенштейна (замена, вставка, удаление,
+    перестановка соседних букв) или limit + 1, если оно больше limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+        # Вся строка больше лимита - дальше расстояние только растет
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+def deletions(word, limit):
+    """Начало слова (PREFIX_LENGTH букв) и все его варианты без 1..limit букв"""
+    word = word[:PREFIX_LENGTH]
+    result = {word}
+    level = {word}
+    for _ in range(limit):
+        level = {variant[:i] + variant[i + 1:] for variant in level for i in range(len(variant))}
+        result |= level
+    return result
+
+
+def match_factor(word, term):
+    """Множитель веса слова словаря term для слова запроса word (0 - не подходит)"""
+    if term == word:
+        return 1.0
+    if term.startswith(word):
+        return PREFIX_FACTOR
+    limit = max_typos(word)
+    distance = bounded_distance(word, term, limit) if limit else 1
+    return TYPO_FACTORS[distance] if distance <= limit else 0
+
+
+class RankedSearch:
+    """Поиск с ранжированием по релевантности и с учетом опечаток.
+
+    Для каждого слова карточки хранится вес: сумма весов полей, где оно
+    встречается (FIELD_WEIGHTS). Слово запроса сравнивается со словарем
+    индекса: точное совпадение, начало слова (bisect по отсортированному
+    словарю) или слово с не более чем max_typos() опечатками. Кандидаты
+    с опечатками ищутся по индексу удалений (как в SymSpell): для начала
+    каждого слова словаря хранятся варианты без 1..MAX_TYPOS букв, и слово
+    запроса - кандидат, если у них есть общий вариант; расстояние правки
+    считается только для таких кандидатов. Разобранные слова запроса
+    кэшируются; такой же индекс удалений по словам из кэша позволяет при
+    добавлении слова в словарь поправить только затронутые записи.
+
+    В результат попадают карточки, где нашлись все слова запроса и которые
+    подходят под фильтры; лучшие limit из них отбираются кучей в том же
+    проходе. Индекс подключается к хранилищу через add_index().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # слово -> {id: вес}
+        self._postings = {}
+        # id -> слова карточки (для удаления из индекса)
+        self._terms = {}
+        # id -> (курс, статус, учреждение в нижнем регистре) для фильтров
+        self._facets = {}
+        self._sorted_terms = []
+        # вариант начала слова без нескольких букв -> слова словаря
+        self._deletions = {}
+        # слово запроса -> {слово словаря: множитель}
+        self._expansions = {}
+        # вариант начала слова запроса без нескольких букв -> слова запроса из кэша
+        self._expansion_deletions = {}
+
+    # ---------- обновление ----------
+
+    def rebuild(self, records):
+        with self._lock:
+            self._reset()
+            for record in records:
+                self._add(record)
+
+    def update(self, old, new):
+        with self._lock:
+            if old is not None:
+                self._remove(old.get('id'))
+            if new is not None:
+                self._add(new)
+
+    def _add(self, record):
+        record_id = record.get('id')
+        weights = {}
+        for field, weight in FIELD_WEIGHTS:
+            value = record.get(field)
+            if isinstance(value, list):
+                value = ' '.join(str(item) for item in value if item)
+            for term in set(tokenize(value if isinstance(value, str) else None)):
+                weights[term] = weights.get(term, 0) + weight
+
+        self._terms[record_id] = tuple(weights)
+        self._facets[record_id] = (str(record.get('course', '')), record.get('status', ''),
+                                   (record.get('institution') or '').lower())
+        for term, weight in weights.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = {}
+                self._term_added(term)
+            posting[record_id] = weight
+
+    def _remove(self, record_id):
+        self._facets.pop(record_id, None)
+        for term in self._terms.pop(record_id, ()):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(record_id, None)
+            if not posting:
+                del self._postings[term]
+                self._term_removed(term)
+
+    def _term_added(self, term):
+        insort(self._sorted_terms, term)
+        variants = deletions(term, MAX_TYPOS)
+        for variant in variants:
+            self._deletions.setdefault(variant, set()).add(term)
+        if not self._expansions:
+            return
+        # Новое слово может подойти только к своим началам (в том числе к
+        # самому себе) и к словам запроса с общим вариантом без нескольких букв
+        words = {term[:i] for i in range(1, len(term) + 1)} & self._expansions.keys()
+        for variant in variants:
+            words |= self._expansion_deletions.get(variant, set())
+        for word in words:
+            factor = match_factor(word, term)
+            if factor:
+                self._expansions[word][term] = factor
+
+    def _term_removed(self, term):
+        i = bisect_left(self._sorted_terms, term)
+        if i < len(self._sorted_terms) and self._sorted_terms[i] == term:
+            del self._sorted_terms[i]
+        for variant in deletions(term, MAX_TYPOS):
+            terms = self._deletions.get(variant)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self._deletions[variant]
+        for expansion in self._expansions.values():
+            expansion.pop(term, None)
+
+    # ---------- поиск ----------
+
+    def _expand(self, word):
+        """Слова словаря, подходящие к слову запроса: {слово: множитель}"""
+        expansion = self._expansions.get(word)
+        if expansion is not None:
+            return expansion
+
+        expansion = {}
+        if word in self._postings:
+            expansion[word] = 1.0
+
+        terms = self._sorted_terms
+        for i in range(bisect_left(terms, word), len(terms)):
+            if not terms[i].startswith(word):
+                break
+            expansion.setdefault(terms[i], PREFIX_FACTOR)
+
+        limit = max_typos(word)
+        if limit:
+            for variant in deletions(word, limit):
+                for term in self._deletions.get(variant, ()):
+                    if term not in expansion:
+                        distance = bounded_distance(word, term, limit)
+                        if distance <= limit:
+                            expansion[term] = TYPO_FACTORS[distance]
+
+        if len(self._expansions) >= EXPANSION_CACHE_SIZE:
+            self._expansions.clear()
+            self._expansion_deletions.clear()
+        self._expansions[word] = expansion
+        for variant in deletions(word, limit):
+            self._expansion_deletions.setdefault(variant, set()).add(word)
+        return expansion
+
+    def search(self, text, limit, course=None, status=None, institution=None):
+        """Лучшие limit карточек по запросу: ([(id, оценка)], всего найдено).
+
+        course, status - точное совпадение, institution - часть названия
+        учреждения в нижнем регистре (как у обычного поиска).
+        """
+        words = list(dict.fromkeys(tokenize(text)))
+        if not words:
+            return [], 0
+
+        # Под блокировкой только разбор слов и копии нужных списков (быстрые,
+        # на уровне C) - запись в индекс не ждет подсчета оценок
+        with self._lock:
+            plans = []
+            for word in words:
+                plans.append([(dict(self._postings[term]), factor)
+                              for term, factor in self._expand(word).items()])
+            facets = self._facets
+
+        # Кандидаты берем по слову с наименьшим числом совпадений
+        plans.sort(key=lambda plan: sum(len(posting) for posting, _ in plan))
+        first, rest = plans[0], plans[1:]
+        candidates = {}
+        for posting, factor in first:
+            for record_id, weight in posting.items():
+                score = weight * factor
+                if score > candidates.get(record_id, 0):
+                    candidates[record_id] = score
+
+        top = []
+        total = 0
+        for record_id, score in candidates.items():
+            if course or status or institution:
+                facet = facets.get(record_id)
+                if (facet is None or (course and facet[0] != course)
+                        or (status and facet[1] != status)
+                        or (institution and institution not in facet[2])):
+                    continue
+            for plan in rest:
+                best = max(posting.get(record_id, 0) * factor for posting, factor in plan) if plan else 0
+                if not best:
+                    break
+                score += best
+            else:
+                total += 1
+                # При равной оценке выше карточка с меньшим id
+                item = (score, -record_id)
+                if len(top) < limit:
+                    heapq.heappush(top, item)
+                elif item > top[0]:
+                    heapq.heapreplace(top, item)
+
+        top.sort(reverse=True)
+        return [(-negative_id, round(score, 3)) for score, negative_id in top], total
@@ -0,0 +1,48 @@
+import os
+
+from search_index import SearchIndex
+from sqlite_store import FullTextSearch, SqliteStore
+from storage import JsonStore
+
+# Пути к файлам данных
+STUDENTS_FILE = os.path.join('data', 'students.json')
+USERS_FILE = os.path.join('data', 'users.json')
+DATABASE_FILE = os.path.join('data', 'app.db')
+
+# journal и snapshot - JSON-файлы (с журналом изменений или без), sqlite - база SQLite
+STORAGE_MODES = ('journal', 'snapshot', 'sqlite')
+
+# Поля студентов с индексами в SQLite и поля полнотекстового поиска
+STUDENT_INDEX_FIELDS = ('userId', 'course', 'status', 'institution')
+STUDENT_SEARCH_FIELDS = ('name', 'description', 'institution', 'skills')
+
+
+# Хранилище (JsonStore или SqliteStore) - репозиторий записей с полем id:
+#   load(), get(id), find(field, value), count(), exists(), current_version()
+#   changes_since(version) - (измененные id, удаленные id) или None, если не умеет
+#   put(record), put_many(records), delete(id), save(records), save_stream(iterable)
+#   allocate_id(), allocate_ids(count), compact(), health() - состояние без чтения данных
+#   locked() - блок чтения-изменения-записи, add_index(index) - индекс в памяти
+
+def open_students(mode):
+    """Хранилище студентов для режима STORAGE_MODE"""
+    if mode == 'sqlite':
+        return SqliteStore(DATABASE_FILE, 'students', index_fields=STUDENT_INDEX_FIELDS,
+                           search_fields=STUDENT_SEARCH_FIELDS)
+    return JsonStore(STUDENTS_FILE, journal=mode == 'journal', index_fields=('userId',))
+
+
+def open_users(mode):
+    """Хранилище пользователей для режима STORAGE_MODE"""
+    if mode == 'sqlite':
+        return SqliteStore(DATABASE_FILE, 'users', index_fields=('username',))
+    return JsonStore(USERS_FILE, journal=mode == 'journal', index_fields=('username',))
+
+
+def open_student_search(store):
+    """Поиск по подстроке: FTS в SQLite или индекс триграмм в памяти"""
+    if isinstance(store, SqliteStore):
+        return FullTextSearch(store)
+    index = SearchIndex()
+    store.add_index(index)
+    return index
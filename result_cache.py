@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+
+
+class CachedResult:
+    """Результат поиска или фильтрации и готовые тела ответов по нему"""
+
+    # Сколько вариантов ответа (страниц, наборов полей) хранить для одного запроса
+    MAX_RESPONSES = 32
+    # Сколько личных ответов ("моя карточка первой") хранить, вытесняются старые
+    MAX_USER_RESPONSES = 256
+
+    def __init__(self, students):
+        self.students = students
+        # userId карточек в результате: для них порядок "моя карточка первой" особый
+        self.user_ids = {student.get('userId') for student in students}
+        self._by_id = None
+        self._responses = {}
+        self._user_responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def by_id(self):
+        """Результат, отсортированный по id (порядок для авторизованных)"""
+        if self._by_id is None:
+            self._by_id = sorted(self.students, key=lambda x: x['id'])
+        return self._by_id
+
+    def get_response(self, key):
+        return self._responses.get(key)
+
+    def set_response(self, key, body):
+        if len(self._responses) >= self.MAX_RESPONSES:
+            self._responses.clear()
+        self._responses[key] = body
+
+    def get_user_response(self, user_id, key):
+        """Ответ с карточкой пользователя первой (действителен, пока действителен результат)"""
+        with self._lock:
+            body = self._user_responses.get((user_id, key))
+            if body is not None:
+                self._user_responses.move_to_end((user_id, key))
+            return body
+
+    def set_user_response(self, user_id, key, body):
+        with self._lock:
+            self._user_responses[(user_id, key)] = body
+            while len(self._user_responses) > self.MAX_USER_RESPONSES:
+                self._user_responses.popitem(last=False)
+
+
+class ResultCache:
+    """LRU-кэш результатов поиска и фильтрации.
+
+    Ключ - нормализованные параметры запроса, значение действительно
+    только для одной версии данных: при смене версии кэш очищается.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, entry):
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return entry
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "version": self._version
+            }
@@ -0,0 +1,104 @@
+import threading
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Инвертированный индекс триграмм для поиска студентов по подстроке.
+
+    Индексируются имя, описание, навыки и образовательное учреждение
+    в нижнем регистре. Для запроса от 3 символов кандидаты - пересечение
+    списков триграмм запроса, затем каждый кандидат проверяется обычным
+    вхождением подстроки, поэтому результат совпадает с полным перебором.
+    Индекс подключается к хранилищу через JsonStore.add_index().
+    """
+
+    def __init__(self):
+        self._postings = {}
+        # id -> тексты записи в нижнем регистре: (имя, описание, учреждение, навыки...)
+        self._texts = {}
+        # id -> порядковый номер записи, чтобы отдавать результат в порядке файла
+        self._order = {}
+        self._next_order = 0
+        self._lock = threading.Lock()
+
+    # ---------- обновление ----------
+
+    def rebuild(self, records):
+        with self._lock:
+            self._postings = {}
+            self._texts = {}
+            self._order = {}
+            self._next_order = 0
+            for record in records:
+                self._add(record)
+
+    def update(self, old, new):
+        with self._lock:
+            if old is not None:
+                self._remove(old, keep_order=new is not None)
+            if new is not None:
+                self._add(new)
+
+    def _add(self, record):
+        record_id = record.get('id')
+        texts = (
+            (record.get('name') or '').lower(),
+            (record.get('description') or '').lower(),
+            (record.get('institution') or '').lower(),
+        ) + tuple((skill or '').lower() for skill in record.get('skills') or [])
+        self._texts[record_id] = texts
+        if record_id not in self._order:
+            self._order[record_id] = self._next_order
+            self._next_order += 1
+
+        grams = set()
+        for text in texts:
+            grams |= _trigrams(text)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(record_id)
+
+    def _remove(self, record, keep_order=False):
+        record_id = record.get('id')
+        texts = self._texts.pop(record_id, ())
+        if not keep_order:
+            self._order.pop(record_id, None)
+        for text in texts:
+            for gram in _trigrams(text):
+                posting = self._postings.get(gram)
+                if posting is not None:
+                    posting.discard(record_id)
+                    if not posting:
+                        del self._postings[gram]
+
+    # ---------- поиск ----------
+
+    def search(self, text):
+        """id записей, у которых text (уже в нижнем регистре) входит
+        в имя, описание, один из навыков или учреждение"""
+        with self._lock:
+            if len(text) >= 3:
+                postings = []
+                for gram in _trigrams(text):
+                    posting = self._postings.get(gram)
+                    if not posting:
+                        return set()
+                    postings.append(posting)
+                postings.sort(key=len)
+                candidates = postings[0].intersection(*postings[1:])
+            else:
+                candidates = self._texts.keys()
+
+            return {record_id for record_id in candidates
+                    if any(text in field for field in self._texts[record_id])}
+
+    def institution_matches(self, record_id, text):
+        """Входит ли text (в нижнем регистре) в название учреждения записи"""
+        texts = self._texts.get(record_id)
+        return texts is not None and text in texts[2]
+
+    def sort_key(self, record_id):
+        """Ключ сортировки по порядку записей в хранилище"""
+        return self._order.get(record_id, 0)
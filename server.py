@@ -1,13 +1,28 @@
-from flask import Flask, jsonify, request, send_from_directory, session
+from flask import Flask, g, jsonify, request, send_file, send_from_directory, session
 from flask_cors import CORS
 import json
 import os
 from datetime import datetime
 import hashlib
+import logging
+import time
 import uuid
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
-from PIL import Image
-import io
+
+from aggregates import StudentStatistics
+from app_logging import RequestSampler, setup_logging
+from assets import AssetManifest
+from changes import ChangeFeed, format_sse
+from metrics import Metrics
+from migrate import seed
+from photos import (THUMBNAIL_SIZES, WEBP_SUPPORTED, PhotoProcessor, QueueFullError,
+                    ensure_thumbnail, read_photo_size, remove_thumbnails)
+from ranked_search import RankedSearch
+from repository import open_student_search, open_students, open_users
+from result_cache import CachedResult, ResultCache
+from student_io import export_csv, export_ndjson, import_format, normalize_row, parse_rows
+from sync_index import ModificationIndex, normalize_stamp
 
 app = Flask(__name__, static_folder='public')
 CORS(app, supports_credentials=True, origins=['http://localhost:5000'])
@@ -15,172 +30,446 @@ app.config['SECRET_KEY'] = 'your-secret-key-change-this-in-production'
 app.config['UPLOAD_FOLDER'] = 'public/images/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB max
 app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+# journal - изменения дописываются в журнал, snapshot - файл перезаписывается целиком,
+# sqlite - база data/app.db (перенос данных: python migrate.py)
+app.config['STORAGE_MODE'] = os.environ.get('STORAGE_MODE', 'journal')
+app.config['MAX_PAGE_SIZE'] = 200
+# Сколько карточек можно получить или изменить одним пакетным запросом
+app.config['MAX_BATCH_SIZE'] = int(os.environ.get('MAX_BATCH_SIZE', 500))
+# Обработка фотографий: число процессов и максимум задач в очереди
+app.config['PHOTO_WORKERS'] = int(os.environ.get('PHOTO_WORKERS', 2))
+app.config['PHOTO_QUEUE_SIZE'] = int(os.environ.get('PHOTO_QUEUE_SIZE', 8))
+# Ограничения на загружаемые фото: пикселей в исходнике и сторона сохраненного JPEG
+app.config['MAX_IMAGE_PIXELS'] = int(os.environ.get('MAX_IMAGE_PIXELS', 40 * 1000 * 1000))
+app.config['MAX_PHOTO_SIDE'] = int(os.environ.get('MAX_PHOTO_SIDE', 2048))
+# Кэш уменьшенных копий фотографий (/thumbs/<размер>/...)
+app.config['THUMBNAIL_FOLDER'] = os.path.join('data', 'thumbs')
+# Логирование: уровень (DEBUG включает дампы запросов, в продакшене INFO)
+# и выборка строк о запросах - все до LOG_REQUESTS_PER_SECOND в секунду, дальше доля
+app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO').upper()
+app.config['LOG_REQUESTS_PER_SECOND'] = int(os.environ.get('LOG_REQUESTS_PER_SECOND', 50))
+app.config['LOG_REQUEST_SAMPLE_RATE'] = float(os.environ.get('LOG_REQUEST_SAMPLE_RATE', 0.01))
+
+# Записи логов пишет в stderr отдельный поток, обработчики запросов его не ждут
+setup_logging(app.config['LOG_LEVEL'])
+logger = logging.getLogger('server')
+request_logger = logging.getLogger('server.requests')
+request_sampler = RequestSampler(per_second=app.config['LOG_REQUESTS_PER_SECOND'],
+                                 sample_rate=app.config['LOG_REQUEST_SAMPLE_RATE'])
+# Одна строка на запрос пишется ниже, строки встроенного сервера не нужны
+logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+# Лента изменений карточек (/api/students/changes): общий файл для всех воркеров
+# и сколько секунд держать одно SSE-подключение (браузер переподключится сам)
+app.config['CHANGES_FILE'] = os.path.join('data', 'changes.log')
+app.config['CHANGES_STREAM_SECONDS'] = int(os.environ.get('CHANGES_STREAM_SECONDS', 300))
+
+# Метрики запросов (/api/metrics): каждый воркер сбрасывает свои счетчики в файл
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR', os.path.join('data', 'metrics'))
+metrics = Metrics(app.config['METRICS_DIR'])
 
 # Создаем папки если их нет
 os.makedirs('data', exist_ok=True)
 os.makedirs('public/images/uploads', exist_ok=True)
 
-# Пути к файлам данных
-STUDENTS_FILE = os.path.join('data', 'students.json')
-USERS_FILE = os.path.join('data', 'users.json')
+# Данные держим в памяти процесса, хранилище перечитывается только при изменении
+students_store = open_students(app.config['STORAGE_MODE'])
+users_store = open_users(app.config['STORAGE_MODE'])
+# Время перечитывания данных (загрузка, изменения других воркеров)
+students_store.timer = metrics.observe
+users_store.timer = metrics.observe
+
+# Поиск по подстроке: индекс триграмм в памяти или FTS в SQLite
+students_search = open_student_search(students_store)
+
+# Статистика по курсам, статусам и учреждениям, обновляется так же
+students_statistics = StudentStatistics()
+students_store.add_index(students_statistics)
+
+# Поиск с ранжированием и опечатками (?rank=1)
+students_ranked = RankedSearch()
+students_store.add_index(students_ranked)
+
+# Порядок изменений и tombstones для синхронизации (?since=)
+students_changes = ModificationIndex()
+students_store.add_index(students_changes)
+
+# Данные читаем при запуске воркера, чтобы первый запрос не ждал загрузки
+students_store.load()
+users_store.load()
+# Изменений до запуска (в том числе из журнала) индекс синхронизации не выдает
+students_changes.mark_loaded()
+
+# Готовые результаты списка, поиска и фильтрации для текущей версии данных
+query_cache = ResultCache(maxsize=256)
+
+# Фотографии обрабатываются в отдельных процессах, обработчик загрузки не ждет
+photo_processor = PhotoProcessor(max_workers=app.config['PHOTO_WORKERS'],
+                                 max_queue=app.config['PHOTO_QUEUE_SIZE'],
+                                 max_side=app.config['MAX_PHOTO_SIDE'],
+                                 thumbnail_dir=app.config['THUMBNAIL_FOLDER'],
+                                 timer=metrics.observe)
+
+# События create/update/delete для подписчиков SSE во всех воркерах
+change_feed = ChangeFeed(app.config['CHANGES_FILE'])
+
+# Статические файлы: хэши содержимого и сжатые варианты считаются при запуске
+static_assets = AssetManifest('public', exclude=('images/uploads',))
+
+
+def send_asset(path):
+    """Отдать файл из public/ через манифест.
+
+    Файлы по пути с хэшем кэшируются навсегда, обычные пути проверяются
+    по ETag. Сжатый вариант выбирается по Accept-Encoding.
+    """
+    asset, immutable = static_assets.get(path)
+    if asset is None:
+        return send_from_directory('public', path)
+
+    encoding, body = asset.choose(request.accept_encodings)
+    response = app.response_class(body, mimetype=asset.mimetype)
+    response.set_etag(f"{asset.digest}-{encoding}")
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    if immutable:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.request_endpoint = request.endpoint or 'unknown'
+    metrics.request_started(g.request_endpoint)
+
+
+@app.after_request
+def log_request(response):
+    """Одна строка о запросе: метод, путь, статус и время (с выборкой)"""
+    g.response_status = response.status_code
+    started = g.get('request_started')
+    if started is not None and request_logger.isEnabledFor(logging.INFO):
+        duration_ms = (time.perf_counter() - started) * 1000
+        if request_sampler.should_log(response.status_code, duration_ms):
+            request_logger.info("%s %s %s %.1fms", request.method, request.full_path.rstrip('?'),
+                                response.status_code, duration_ms)
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(error):
+    # teardown вызывается и при необработанном исключении - тогда статус 500
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.request_finished(g.request_endpoint, request.method, g.get('response_status', 500),
+                                 time.perf_counter() - started)
 
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
 
-def load_data(filename):
-    """Загрузка данных из файла"""
-    try:
-        if os.path.exists(filename):
-            with open(filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
-    except Exception as e:
-        print(f"❌ Ошибка загрузки {filename}: {e}")
-        return []
+def dataset_etag(per_user=True):
+    """Сильный ETag ответа, построенного по всему списку студентов.
+
+    Ответ зависит от версии данных, параметров запроса и (из-за сортировки
+    "моя карточка первой") от текущего пользователя.
+    """
+    key = f"{request.path}?{sorted(request.args.items(multi=True))}"
+    if per_user:
+        key += f"|{session.get('user_id')}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+    return f"v{students_store.current_version()}-{digest}"
+
+
+def record_etag(student):
+    """Сильный ETag карточки по ее id и времени изменения"""
+    digest = hashlib.sha1(str(student.get('updatedAt')).encode()).hexdigest()[:12]
+    return f"s{student.get('id')}-{digest}"
+
+
+def not_modified(etag):
+    """Ответ 304, если у клиента уже есть эта версия (If-None-Match)"""
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return None
+
+
+def with_etag(response, etag):
+    """Добавить ETag к ответу: браузер сохранит его и будет перепроверять"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def select_fields(students, fields):
+    """Оставить в карточках только поля из списка через запятую (и id)"""
+    wanted = ['id'] + [field.strip() for field in fields.split(',') if field.strip() and field.strip() != 'id']
+    return [{field: student[field] for field in wanted if field in student} for student in students]
+
+
+def students_delta(since, etag):
+    """Изменения после since (версия данных или время ISO).
+
+    Ответ: {"changed": [...], "deleted": [id, ...], "version": N,
+    "timestamp": "...", "full": false}. Следующий запрос делается
+    с since=version (или timestamp). Если изменения с since восстановить
+    нельзя (перезапуск, перезапись данных), приходит весь список и full: true.
+    """
+    version = students_store.current_version()
+    if not students_changes.marked(version):
+        # Версию связываем с меткой под блокировкой - когда ни одна запись
+        # не применена наполовину и индекс догнал изменения других воркеров
+        with students_store.locked():
+            version = students_store.current_version()
+            students_changes.mark(version)
+    timestamp = students_changes.high_water
+
+    if since.isdigit():
+        changes = students_store.changes_since(int(since), version)
+        if changes is None:
+            changes = students_changes.changes_since(students_changes.stamp_for_version(int(since)))
+    else:
+        stamp = normalize_stamp(since.replace(' ', '+'))
+        if stamp is None:
+            return jsonify({"error": "since - версия данных или время в формате ISO"}), 400
+        changes = students_changes.changes_since(stamp)
+
+    if changes is None:
+        changed, deleted, full = students_store.load(), [], True
+    else:
+        changed_ids, deleted, full = changes[0], changes[1], False
+        changed = [student for student in map(students_store.get, changed_ids) if student is not None]
+
+    fields = request.args.get('fields', '')
+    logger.debug("🔄 Изменения с %s: %s изменено, %s удалено", since, len(changed), len(deleted))
+    with metrics.timed('serialize'):
+        return with_etag(jsonify({
+            "changed": select_fields(changed, fields) if fields else changed,
+            "deleted": deleted,
+            "version": version,
+            "timestamp": timestamp,
+            "full": full
+        }), etag)
+
+
+def students_response(students):
+    """Ответ со списком студентов.
+
+    Без параметров отдается весь список, как раньше. С параметрами
+    limit, cursor или fields отдается страница:
+    {"items": [...], "total": N, "nextCursor": "..." или null}.
+    cursor - значение nextCursor из предыдущего ответа, fields - список
+    полей через запятую (id добавляется всегда).
+    """
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor', type=int)
+    fields = request.args.get('fields', '')
+
+    if limit is None and cursor is None and not fields:
+        return jsonify(students)
+
+    total = len(students)
+    start = min(max(cursor or 0, 0), total)
+    page_size = app.config['MAX_PAGE_SIZE'] if limit is None else limit
+    end = start + min(max(page_size, 1), app.config['MAX_PAGE_SIZE'])
+    page = students[start:end]
 
+    if fields:
+        page = select_fields(page, fields)
 
-def save_data(filename, data):
-    """Сохранение данных в файл"""
+    return jsonify({
+        "items": page,
+        "total": total,
+        "nextCursor": str(end) if end < total else None
+    })
+
+
+def cached_students_response(result):
+    """Ответ по закэшированному результату списка, поиска или фильтрации.
+
+    Сортировка "моя карточка первой" применяется здесь: если карточки
+    пользователя в результате нет, порядок просто по id и общий для всех.
+    Ответ с карточкой пользователя первой кэшируется для этого пользователя
+    (результат сам действителен только для одной версии данных).
+    """
+    key = (request.args.get('limit'), request.args.get('cursor'), request.args.get('fields'))
+    current_user_id = session.get('user_id')
+    if current_user_id is not None and current_user_id in result.user_ids:
+        body = result.get_user_response(current_user_id, key)
+        if body is None:
+            with metrics.timed('serialize'):
+                mine = [s for s in result.by_id() if s.get('userId') == current_user_id]
+                students = mine + [s for s in result.by_id() if s.get('userId') != current_user_id]
+                body = students_response(students).get_data()
+            result.set_user_response(current_user_id, key, body)
+        return app.response_class(body, mimetype='application/json')
+
+    variant = 'file' if current_user_id is None else 'id'
+    body = result.get_response((variant,) + key)
+    if body is None:
+        with metrics.timed('serialize'):
+            students = result.students if variant == 'file' else result.by_id()
+            body = students_response(students).get_data()
+        result.set_response((variant,) + key, body)
+    return app.response_class(body, mimetype='application/json')
+
+
+def validate_new_student(data):
+    """Ошибка в данных новой карточки или None (общая для создания и импорта)"""
+    # Обязательные поля
+    required_fields = ['name', 'course', 'description', 'institution']
+    for field in required_fields:
+        if field not in data or not str(data.get(field, '')).strip():
+            return f"Поле '{field}' обязательно"
     try:
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        print(f"❌ Ошибка сохранения {filename}: {e}")
-        return False
+        int(data.get('course'))
+    except (TypeError, ValueError):
+        return "Поле 'course' должно быть числом"
+    return None
+
+
+def new_student_record(data, student_id, user_id):
+    """Карточка нового студента из проверенных данных"""
+    return {
+        "id": student_id,
+        "name": data.get('name', '').strip(),
+        "course": int(data.get('course', 1)),
+        "status": data.get('status', 'studying'),
+        "description": data.get('description', '').strip(),
+        "fullInfo": data.get('fullInfo', data.get('description', '').strip()),
+        "institution": data.get('institution', '').strip(),
+        "skills": data.get('skills', []),
+        "links": data.get('links', {}),
+        "photo": data.get('photo', '/images/default.jpg'),
+        "createdAt": datetime.now().isoformat(),
+        "updatedAt": datetime.now().isoformat(),
+        "userId": user_id
+    }
+
+
+def apply_student_changes(student, data):
+    """Применить изменения из data к копии карточки; ошибка или None"""
+    # Проверяем обязательные поля
+    required_fields = ['name', 'course', 'description', 'institution']
+    for field in required_fields:
+        if field in data and not str(data.get(field, '')).strip():
+            return f"Поле '{field}' не может быть пустым"
+
+    # Обновляем данные
+    updatable_fields = ['name', 'course', 'status', 'description', 'fullInfo',
+                        'institution', 'skills', 'links', 'photo']
+
+    for field in updatable_fields:
+        if field in data:
+            if field == 'course':
+                try:
+                    student[field] = int(data[field])
+                except:
+                    student[field] = 1
+            elif field == 'photo' and (data[field] == '' or data[field] is None):
+                # Если фото очищено, ставим дефолтное
+                student[field] = '/images/default.jpg'
+            elif field == 'skills':
+                # Обрабатываем навыки
+                if isinstance(data[field], str):
+                    student[field] = [skill.strip() for skill in data[field].split(',') if skill.strip()]
+                else:
+                    student[field] = data[field]
+            elif field == 'links':
+                # Обрабатываем ссылки
+                if isinstance(data[field], dict):
+                    student[field] = data[field]
+                else:
+                    try:
+                        student[field] = json.loads(data[field]) if data[field] else {}
+                    except:
+                        student[field] = {}
+            elif field == 'institution':
+                # Образовательное учреждение
+                student[field] = data[field].strip()
+            else:
+                student[field] = data[field]
+    return None
 
 
 def init_data():
     """Инициализация начальных данных"""
-    print("\n🔧 ИНИЦИАЛИЗАЦИЯ ДАННЫХ")
-
-    # Проверяем и создаем файл пользователей
-    if not os.path.exists(USERS_FILE):
-        admin_hash = hashlib.sha256("admin123".encode()).hexdigest()
-        student_hash = hashlib.sha256("student123".encode()).hexdigest()
-
-        initial_users = [
-            {
-                "id": 1,
-                "username": "admin",
-                "password": admin_hash,
-                "role": "admin",
-                "email": "admin@college.ru",
-                "createdAt": datetime.now().isoformat()
-            },
-            {
-                "id": 2,
-                "username": "student1",
-                "password": student_hash,
-                "role": "student",
-                "email": "student1@college.ru",
-                "createdAt": datetime.now().isoformat()
-            }
-        ]
-        save_data(USERS_FILE, initial_users)
-        print(f"✅ Создан файл пользователей с {len(initial_users)} записями")
-
-    # Проверяем и создаем файл студентов
-    if not os.path.exists(STUDENTS_FILE):
-        initial_students = [
-            {
-                "id": 1,
-                "name": "Иван Иванов",
-                "course": 1,
-                "status": "studying",
-                "description": "Backend-разработчик, увлекается Python и SQL",
-                "fullInfo": "Студент 1 курса, изучает Python и базы данных.",
-                "institution": "Колледж информационных технологий №1",
-                "skills": ["Python", "SQL", "PostgreSQL"],
-                "links": {
-                    "github": "https://github.com/ivanov",
-                    "portfolio": "https://ivanov-portfolio.ru"
-                },
-                "photo": "/images/default.jpg",
-                "createdAt": datetime.now().isoformat(),
-                "updatedAt": datetime.now().isoformat(),
-                "userId": 1
-            },
-            {
-                "id": 2,
-                "name": "Мария Петрова",
-                "course": 3,
-                "status": "studying",
-                "description": "Frontend-разработчик, специалист по React",
-                "fullInfo": "Студентка 3 курса, создала несколько проектов на React.",
-                "institution": "Колледж информационных технологий №1",
-                "skills": ["JavaScript", "React", "HTML", "CSS"],
-                "links": {
-                    "github": "https://github.com/maria",
-                    "portfolio": "https://maria-dev.ru"
-                },
-                "photo": "/images/default.jpg",
-                "createdAt": datetime.now().isoformat(),
-                "updatedAt": datetime.now().isoformat(),
-                "userId": 2
-            },
-            {
-                "id": 3,
-                "name": "Алексей Сидоров",
-                "course": 2,
-                "status": "studying",
-                "description": "Data Science, интересуется машинным обучением",
-                "fullInfo": "Студент 2 курса, изучает Python, математику и ML.",
-                "institution": "Технический колледж",
-                "skills": ["Python", "Pandas", "NumPy", "Scikit-learn"],
-                "links": {
-                    "github": "https://github.com/alexey",
-                    "portfolio": "https://alexey-ds.ru"
-                },
-                "photo": "/images/default.jpg",
-                "createdAt": datetime.now().isoformat(),
-                "updatedAt": datetime.now().isoformat(),
-                "userId": None
-            }
-        ]
-        save_data(STUDENTS_FILE, initial_students)
-        print(f"✅ Создан файл студентов с {len(initial_students)} записями")
+    logger.info("🔧 Инициализация данных")
+
+    # Пустые хранилища заполняем тестовыми пользователями и студентами
+    seed(users_store, students_store)
 
     # Создаем папку для загрузок если ее нет
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-    print("=" * 50 + "\n")
-
 
 # ========== API МАРШРУТЫ ==========
 
 @app.route('/')
 def index():
-    return send_from_directory('public', 'index.html')
+    return send_asset('index.html')
 
 
 @app.route('/admin')
 def admin():
-    return send_from_directory('public', 'admin.html')
+    return send_asset('admin.html')
 
 
 @app.route('/<path:path>')
 def static_files(path):
-    return send_from_directory('public', path)
+    return send_asset(path)
+
+
+@app.route('/thumbs/<size>/<path:photo>')
+def photo_thumbnail(size, photo):
+    """Уменьшенная копия фотографии из public/images.
+
+    Копия создается при первом запросе и хранится в кэше. Если браузер
+    принимает WebP, отдается WebP, иначе JPEG.
+    """
+    if size not in THUMBNAIL_SIZES:
+        return jsonify({"error": "Неизвестный размер"}), 404
+
+    source_path = safe_join(os.path.join('public', 'images'), photo)
+    if source_path is None or not os.path.isfile(source_path):
+        return jsonify({"error": "Файл не найден"}), 404
+
+    fmt = 'webp' if WEBP_SUPPORTED and 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+    try:
+        thumb_path = ensure_thumbnail(source_path, app.config['THUMBNAIL_FOLDER'], size, fmt)
+    except Exception as e:
+        logger.warning("⚠️ Не удалось создать уменьшенную копию %s: %s", photo, e)
+        return send_from_directory(os.path.join('public', 'images'), photo)
+
+    # Адрес не меняется при замене фото, поэтому браузер проверяет копию по ETag
+    response = send_file(thumb_path, mimetype=f'image/{fmt}', conditional=True, max_age=0)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept'
+    return response
 
 
 @app.route('/api/upload-photo', methods=['POST'])
 def upload_photo():
     """Загрузка фотографии"""
     try:
-        print("📤 Запрос на загрузку фото получен")
+        logger.debug("📤 Запрос на загрузку фото получен")
 
         if 'photo' not in request.files:
-            print("❌ Файл не найден в запросе")
+            logger.debug("❌ Файл не найден в запросе")
             return jsonify({"error": "Файл не найден"}), 400
 
         file = request.files['photo']
         student_id = request.form.get('studentId')
 
-        print(f"📁 Получен файл: {file.filename}, studentId: {student_id}")
+        logger.debug("📁 Получен файл: %s, studentId: %s", file.filename, student_id)
 
         if file.filename == '':
             return jsonify({"error": "Файл не выбран"}), 400
@@ -199,68 +488,98 @@ def upload_photo():
 
             file_path = os.path.join(app.config['UPLOAD_FOLDER'], new_filename)
 
-            # Сохраняем файл
-            file.save(file_path)
+            # Файл не сохраняется на диск: проверяем заголовок и передаем
+            # содержимое в пул процессов, JPEG будет записан один раз
+            data = file.read()
+            try:
+                width, height = read_photo_size(data)
+            except Exception:
+                return jsonify({"error": "Файл не является изображением"}), 400
+
+            if width * height > app.config['MAX_IMAGE_PIXELS']:
+                logger.warning("⚠️ Слишком большое изображение: %sx%s", width, height)
+                return jsonify({"error": f"Слишком большое изображение: {width}x{height}"}), 400
 
-            # Оптимизируем изображение
             try:
-                with Image.open(file_path) as img:
-                    # Конвертируем в RGB если нужно
-                    if img.mode in ('RGBA', 'P'):
-                        img = img.convert('RGB')
-                    # Сохраняем с оптимизацией
-                    img.save(file_path, 'JPEG', quality=85, optimize=True)
-            except Exception as e:
-                print(f"⚠️ Не удалось оптимизировать изображение: {e}")
-
-            # URL для доступа к файлу
+                photo_processor.submit(data, file_path)
+            except QueueFullError:
+                logger.warning("⚠️ Очередь обработки фотографий переполнена")
+                response = jsonify({"error": "Сервер загружен, повторите попытку позже"})
+                response.headers['Retry-After'] = '5'
+                return response, 503
+
+            # URL для доступа к файлу, он станет доступен после обработки
             photo_url = f"/images/uploads/{new_filename}"
 
-            print(f"✅ Фотография загружена: {file_path}")
+            logger.info("✅ Фотография принята в обработку: %s", file_path)
             return jsonify({
                 "success": True,
+                "status": "pending",
                 "photoUrl": photo_url,
-                "filename": new_filename
-            })
+                "filename": new_filename,
+                "statusUrl": f"/api/upload-photo/{new_filename}/status"
+            }), 202
         else:
             return jsonify({"error": "Неподдерживаемый формат файла"}), 400
 
     except Exception as e:
-        print(f"❌ Ошибка загрузки фотографии: {e}")
+        logger.exception("❌ Ошибка загрузки фотографии: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/upload-photo/<filename>/status', methods=['GET'])
+def upload_photo_status(filename):
+    """Состояние обработки загруженной фотографии"""
+    try:
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(filename))
+        status = photo_processor.status(file_path)
+        if status is None:
+            return jsonify({"error": "Файл не найден"}), 404
+
+        result = {"status": status, "filename": filename}
+        if status == 'ready':
+            result["photoUrl"] = f"/images/uploads/{filename}"
+        return jsonify(result)
+
+    except Exception as e:
+        logger.exception("❌ Ошибка проверки фотографии: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
 @app.route('/add-student')
 def add_student_page():
-    return send_from_directory('public', 'add-student.html')
+    return send_asset('add-student.html')
 
 @app.route('/api/students', methods=['GET'])
 def get_students():
     """Получить всех студентов"""
     try:
-        print("📊 Получен запрос на список студентов")
-
-        # Загружаем студентов
-        students = load_data(STUDENTS_FILE)
-
-        # Проверяем, что файл существует и не пустой
-        if students is None:
-            print("❌ Файл студентов пуст или не существует")
-            students = []
-
-        print(f"📁 Загружено {len(students)} студентов из файла")
+        logger.debug("📊 Получен запрос на список студентов")
+
+        # Список у клиента актуален - ничего не загружаем
+        etag = dataset_etag()
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        # Синхронизация: только изменения после since
+        since = request.args.get('since', '').strip()
+        if since:
+            return students_delta(since, etag)
+
+        version = students_store.current_version()
+        result = query_cache.get(('all',), version)
+        if result is None:
+            # Загружаем студентов
+            students = students_store.load()
+            logger.debug("📁 Загружено %s студентов из файла", len(students))
+            result = query_cache.put(('all',), version, CachedResult(students))
 
         # Если пользователь авторизован, его карточка будет первой
-        if 'user_id' in session:
-            current_user_id = session['user_id']
-            print(f"👤 Текущий пользователь ID: {current_user_id}")
-            # Сортируем: сначала карточка пользователя, затем остальные
-            students.sort(key=lambda x: (0 if x.get('userId') == current_user_id else 1, x['id']))
-
-        print(f"✅ Отправляю {len(students)} студентов")
-        return jsonify(students)
+        logger.debug("✅ Отправляю %s студентов", len(result.students))
+        return with_etag(cached_students_response(result), etag)
     except Exception as e:
-        print(f"❌ Ошибка в get_students: {e}")
+        logger.exception("❌ Ошибка в get_students: %s", e)
         return jsonify({"error": "Внутренняя ошибка сервера"}), 500
 
 
@@ -274,89 +593,135 @@ def search_students():
         status = request.args.get('status', '')
         institution = request.args.get('institution', '').lower()
 
-        # Загружаем студентов
-        students = load_data(STUDENTS_FILE)
+        etag = dataset_etag()
+        cached = not_modified(etag)
+        if cached:
+            return cached
 
-        # Фильтрация
-        filtered_students = []
+        # Режим релевантности: лучшие совпадения по оценке, с учетом опечаток
+        if request.args.get('rank') in ('1', 'true'):
+            return with_etag(ranked_search_response(search, course, status, institution), etag)
 
-        for student in students:
-            # Поиск по ID
-            if search:
-                if search.isdigit() and int(search) == student.get('id', 0):
-                    filtered_students.append(student)
-                    continue
+        version = students_store.current_version()
+        cache_key = ('search', search, course if course != 'all' else '',
+                     status if status != 'all' else '', institution)
+        result = query_cache.get(cache_key, version)
+        if result is None:
+            with metrics.timed('search'):
+                result = query_cache.put(cache_key, version, CachedResult(
+                    find_students(search, course, status, institution)))
 
-            # Поиск по имени, описанию, навыкам
-            matches_search = False
-            if search:
-                # Поиск в имени
-                if search in student.get('name', '').lower():
-                    matches_search = True
-                # Поиск в описании
-                elif search in student.get('description', '').lower():
-                    matches_search = True
-                # Поиск в навыках
-                elif any(search in skill.lower() for skill in student.get('skills', [])):
-                    matches_search = True
-                # Поиск в образовательном учреждении
-                elif search in student.get('institution', '').lower():
-                    matches_search = True
-            else:
-                matches_search = True
+        logger.debug("🔍 Результаты поиска: найдено %s студентов", len(result.students))
+        return with_etag(cached_students_response(result), etag)
 
-            # Фильтр по курсу
-            matches_course = True
-            if course and course != 'all':
-                matches_course = str(student.get('course', '')) == course
+    except Exception as e:
+        logger.exception("❌ Ошибка поиска студентов: %s", e)
+        return jsonify({"error": str(e)}), 500
 
-            # Фильтр по статусу
-            matches_status = True
-            if status and status != 'all':
-                matches_status = student.get('status', '') == status
 
-            # Фильтр по образовательному учреждению
-            matches_institution = True
-            if institution:
-                matches_institution = institution in student.get('institution', '').lower()
+def find_students(search, course, status, institution):
+    """Студенты, подходящие под поиск и фильтры (в порядке хранилища)"""
+    # Загружаем студентов
+    students = students_store.load()
 
-            # Если все условия совпадают, добавляем студента
-            if matches_search and matches_course and matches_status and matches_institution:
-                filtered_students.append(student)
+    # Поиск по ID: такая карточка попадает в результат без фильтров
+    id_match = int(search) if search.isdigit() else None
 
-        # Сортировка для авторизованных пользователей
-        if 'user_id' in session:
-            current_user_id = session['user_id']
-            filtered_students.sort(key=lambda x: (0 if x.get('userId') == current_user_id else 1, x['id']))
+    if search:
+        # Поиск по имени, описанию, навыкам и учреждению через индекс
+        matched_ids = students_search.search(search)
+        if id_match is not None and students_store.get(id_match) is not None:
+            matched_ids.add(id_match)
+        candidates = [students_store.get(student_id)
+                      for student_id in sorted(matched_ids, key=students_search.sort_key)]
+    else:
+        candidates = students
 
-        print(f"🔍 Результаты поиска: найдено {len(filtered_students)} студентов")
-        return jsonify(filtered_students)
+    # Фильтрация
+    filtered_students = []
 
-    except Exception as e:
-        print(f"❌ Ошибка поиска студентов: {e}")
-        return jsonify({"error": str(e)}), 500
+    for student in candidates:
+        # Если все условия совпадают, добавляем студента
+        if student.get('id') == id_match or matches_filters(student, course, status, institution):
+            filtered_students.append(student)
+
+    return filtered_students
+
+
+def matches_filters(student, course, status, institution):
+    """Подходит ли карточка под фильтры курса, статуса и учреждения"""
+    # Фильтр по курсу
+    if course and course != 'all' and str(student.get('course', '')) != course:
+        return False
+
+    # Фильтр по статусу
+    if status and status != 'all' and student.get('status', '') != status:
+        return False
+
+    # Фильтр по образовательному учреждению
+    if institution and not students_search.institution_matches(student['id'], institution):
+        return False
+
+    return True
+
+
+def ranked_search_response(search, course, status, institution):
+    """Лучшие карточки по релевантности: {"items": [...], "scores": [...], "total": N}.
+
+    limit - сколько карточек вернуть (по умолчанию 20, не больше MAX_PAGE_SIZE),
+    total - сколько карточек подошло всего. Порядок не зависит от пользователя.
+    """
+    limit = min(max(request.args.get('limit', 20, type=int), 1), app.config['MAX_PAGE_SIZE'])
+    fields = request.args.get('fields', '')
+    version = students_store.current_version()
+    cache_key = ('ranked', search, course if course != 'all' else '',
+                 status if status != 'all' else '', institution, limit, fields)
+    body = query_cache.get(cache_key, version)
+    if body is None:
+        with metrics.timed('search'):
+            top, total = students_ranked.search(search, limit,
+                                                course=course if course != 'all' else None,
+                                                status=status if status != 'all' else None,
+                                                institution=institution or None)
+            students = [students_store.get(student_id) for student_id, _ in top]
+        with metrics.timed('serialize'):
+            body = query_cache.put(cache_key, version, jsonify({
+                "items": select_fields(students, fields) if fields else students,
+                "scores": [score for _, score in top],
+                "total": total
+            }).get_data())
+        logger.debug("🔍 Поиск по релевантности '%s': найдено %s", search, total)
+    return app.response_class(body, mimetype='application/json')
 
 
 @app.route('/api/students/<int:student_id>', methods=['GET'])
 def get_student(student_id):
     """Получить студента по ID"""
     try:
-        print(f"🔍 Получен запрос на студента ID: {student_id}")
-        students = load_data(STUDENTS_FILE)
-
-        if not students:
+        logger.debug("🔍 Получен запрос на студента ID: %s", student_id)
+        if not students_store.count():
             return jsonify({"error": "База данных студентов пуста"}), 404
 
-        student = next((s for s in students if s.get('id') == student_id), None)
+        student = students_store.get(student_id)
 
         if not student:
-            print(f"❌ Студент ID {student_id} не найден")
+            logger.debug("❌ Студент ID %s не найден", student_id)
             return jsonify({"error": "Студент не найден"}), 404
 
-        print(f"✅ Найден студент: {student['name']}")
-        return jsonify(student)
+        etag = record_etag(student)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        logger.debug("✅ Найден студент: %s", student['name'])
+        response = with_etag(jsonify(student), etag)
+        try:
+            response.last_modified = datetime.fromisoformat(student['updatedAt']).astimezone()
+        except (KeyError, TypeError, ValueError):
+            pass
+        return response
     except Exception as e:
-        print(f"❌ Ошибка получения студента: {e}")
+        logger.exception("❌ Ошибка получения студента: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -369,106 +734,187 @@ def filter_students():
         status = request.args.get('status', '')
         institution = request.args.get('institution', '')
 
-        # Загружаем студентов
-        students = load_data(STUDENTS_FILE)
+        etag = dataset_etag()
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        version = students_store.current_version()
+        cache_key = ('filter', course if course != 'all' else '',
+                     status if status != 'all' else '', institution if institution != 'all' else '')
+        result = query_cache.get(cache_key, version)
+        if result is None:
+            with metrics.timed('filter'):
+                result = query_cache.put(cache_key, version, CachedResult(
+                    filter_students_by(course, status, institution)))
 
-        # Фильтрация
-        filtered_students = []
+        logger.debug("🔍 Результаты фильтрации: найдено %s студентов", len(result.students))
+        return with_etag(cached_students_response(result), etag)
 
-        for student in students:
-            # Фильтр по курсу
-            matches_course = True
-            if course and course != 'all':
-                matches_course = str(student.get('course', '')) == course
+    except Exception as e:
+        logger.exception("❌ Ошибка фильтрации студентов: %s", e)
+        return jsonify({"error": str(e)}), 500
 
-            # Фильтр по статусу
-            matches_status = True
-            if status and status != 'all':
-                matches_status = student.get('status', '') == status
 
-            # Фильтр по образовательному учреждению
-            matches_institution = True
-            if institution and institution != 'all':
-                matches_institution = institution == student.get('institution', '')
+@app.route('/api/students/export', methods=['GET'])
+def export_students():
+    """Выгрузка студентов потоком: NDJSON или CSV (?format=csv).
 
-            # Если все условия совпадают, добавляем студента
-            if matches_course and matches_status and matches_institution:
-                filtered_students.append(student)
+    Принимает те же параметры, что и /api/students/filter (course, status,
+    institution). Ответ отдается порциями, весь файл в памяти не собирается.
+    """
+    try:
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in ('ndjson', 'csv'):
+            return jsonify({"error": "Формат выгрузки: ndjson или csv"}), 400
+        course = request.args.get('course', '')
+        status = request.args.get('status', '')
+        institution = request.args.get('institution', '')
 
-        # Сортировка для авторизованных пользователей
-        if 'user_id' in session:
-            current_user_id = session['user_id']
-            filtered_students.sort(key=lambda x: (0 if x.get('userId') == current_user_id else 1, x['id']))
+        etag = dataset_etag(per_user=False)
+        cached = not_modified(etag)
+        if cached:
+            return cached
 
-        print(f"🔍 Результаты фильтрации: найдено {len(filtered_students)} студентов")
-        return jsonify(filtered_students)
+        # Фильтруем по ходу отправки: первая порция не ждет просмотра всех записей
+        students = iter_students_by(course, status, institution)
+        if fmt == 'csv':
+            response = app.response_class(export_csv(students), mimetype='text/csv')
+        else:
+            response = app.response_class(export_ndjson(students), mimetype='application/x-ndjson')
+        response.headers['Content-Disposition'] = f'attachment; filename=students.{fmt}'
+        logger.debug("📤 Выгрузка студентов (%s)", fmt)
+        return with_etag(response, etag)
 
     except Exception as e:
-        print(f"❌ Ошибка фильтрации студентов: {e}")
+        logger.exception("❌ Ошибка выгрузки студентов: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+def filter_students_by(course, status, institution):
+    """Студенты с заданными курсом, статусом и учреждением (в порядке хранилища)"""
+    return list(iter_students_by(course, status, institution))
+
+
+def iter_students_by(course, status, institution):
+    """Те же студенты, что у filter_students_by, по одному"""
+    # Загружаем студентов
+    students = students_store.load()
+
+    # Фильтрация
+    for student in students:
+        # Фильтр по курсу
+        matches_course = True
+        if course and course != 'all':
+            matches_course = str(student.get('course', '')) == course
+
+        # Фильтр по статусу
+        matches_status = True
+        if status and status != 'all':
+            matches_status = student.get('status', '') == status
+
+        # Фильтр по образовательному учреждению
+        matches_institution = True
+        if institution and institution != 'all':
+            matches_institution = institution == student.get('institution', '')
+
+        # Если все условия совпадают, отдаем студента
+        if matches_course and matches_status and matches_institution:
+            yield student
+
+
+@app.route('/api/students/changes', methods=['GET'])
+def student_changes():
+    """Поток изменений карточек (Server-Sent Events).
+
+    События created, updated, deleted и imported содержат id карточек
+    и версию данных. Версия передается как id события, поэтому браузер
+    при переподключении присылает Last-Event-ID и получает пропущенное.
+    Если пропущенного в ленте уже нет, приходит reset - список нужно
+    перезагрузить. Подключение занимает поток воркера, поэтому gunicorn
+    запускается с потоками (gunicorn.conf.py) или асинхронными воркерами.
+    Синхронный воркер поток не отдает: ответ 204, и браузер не переподключается.
+    """
+    if not request.environ.get('wsgi.multithread'):
+        return app.response_class(status=204)
+
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    since = int(since) if since and since.isdigit() else None
+    subscription = change_feed.subscribe()
+    deadline = time.monotonic() + app.config['CHANGES_STREAM_SECONDS']
+
+    def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            version = students_store.current_version()
+            last_version = since
+            if since is None:
+                yield format_sse({"version": version}, 'ready')
+                last_version = version
+            else:
+                backlog = change_feed.events_since(since)
+                if backlog is None:
+                    yield format_sse({"version": version}, 'reset')
+                    last_version = version
+                else:
+                    for event in backlog:
+                        yield format_sse(event)
+                        last_version = event['version']
+
+            while time.monotonic() < deadline:
+                event = subscription.get(timeout=15)
+                if subscription.overflowed:
+                    yield format_sse({"version": students_store.current_version()}, 'reset')
+                    return
+                if event is None:
+                    yield ': ping\n\n'
+                elif event['version'] > last_version:
+                    last_version = event['version']
+                    yield format_sse(event)
+        finally:
+            change_feed.unsubscribe(subscription)
+
+    response = app.response_class(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @app.route('/api/students/statistics', methods=['GET'])
 def get_statistics():
-    """Получить статистику студентов"""
-    try:
-        students = load_data(STUDENTS_FILE)
-
-        if not students:
-            return jsonify({
-                "total": 0,
-                "byCourse": {"1": 0, "2": 0, "3": 0, "4": 0},
-                "byStatus": {
-                    "studying": 0,
-                    "graduated": 0,
-                    "expelled": 0,
-                    "academic_leave": 0
-                },
-                "institutions": []
-            })
+    """Получить статистику студентов
 
-        # Общая статистика
-        total = len(students)
-
-        # Статистика по курсам
-        by_course = {"1": 0, "2": 0, "3": 0, "4": 0}
-        for student in students:
-            course = str(student.get('course', ''))
-            if course in by_course:
-                by_course[course] += 1
-
-        # Статистика по статусам
-        by_status = {
-            "studying": 0,
-            "graduated": 0,
-            "expelled": 0,
-            "academic_leave": 0
-        }
-        for student in students:
-            status = student.get('status', 'studying')
-            if status in by_status:
-                by_status[status] += 1
-
-        # Список образовательных учреждений
-        institutions = list(set([s.get('institution', 'Не указано') for s in students if s.get('institution')]))
+    ?extended=1 добавляет частоту навыков и распределение курс x статус.
+    """
+    try:
+        etag = dataset_etag(per_user=False)
+        cached = not_modified(etag)
+        if cached:
+            return cached
 
-        return jsonify({
-            "total": total,
-            "byCourse": by_course,
-            "byStatus": by_status,
-            "institutions": institutions
-        })
+        students_store.load()
+        extended = request.args.get('extended', '') in ('1', 'true')
+        top_skills = request.args.get('top', 20, type=int)
+        return with_etag(jsonify(students_statistics.snapshot(extended=extended, top_skills=top_skills)), etag)
 
     except Exception as e:
-        print(f"❌ Ошибка получения статистики: {e}")
+        logger.exception("❌ Ошибка получения статистики: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+def existing_card_response(card):
+    """Ответ студенту, у которого карточка уже есть"""
+    return jsonify({
+        "error": "У вас уже есть карточка. Вы можете редактировать только свою карточку.",
+        "studentId": card['id']
+    }), 400
+
+
 @app.route('/api/students', methods=['POST'])
 def create_student():
     """Создать нового студента"""
     try:
-        print("➕ Получен запрос на создание студента")
+        logger.debug("➕ Получен запрос на создание студента")
 
         # Проверяем авторизацию
         if 'user_id' not in session:
@@ -480,13 +926,9 @@ def create_student():
         # Проверяем, может ли пользователь создавать карточки
         if current_role != 'admin':
             # Для студентов проверяем, есть ли уже карточка
-            students = load_data(STUDENTS_FILE)
-            existing_card = next((s for s in students if s.get('userId') == current_user_id), None)
+            existing_card = students_store.find('userId', current_user_id)
             if existing_card:
-                return jsonify({
-                    "error": "У вас уже есть карточка. Вы можете редактировать только свою карточку.",
-                    "studentId": existing_card['id']
-                }), 400
+                return existing_card_response(existing_card)
 
         # Проверяем Content-Type
         if request.content_type.startswith('multipart/form-data'):
@@ -525,55 +967,235 @@ def create_student():
             # Получаем JSON данные
             data = request.get_json()
             if not data:
-                print("❌ Нет данных в запросе")
+                logger.debug("❌ Нет данных в запросе")
                 return jsonify({"error": "Нет данных"}), 400
 
-        print(f"📝 Данные для создания: {data}")
+        logger.debug("📝 Данные для создания: %s", data)
+
+        error = validate_new_student(data)
+        if error:
+            logger.debug("❌ %s", error)
+            return jsonify({"error": error}), 400
 
-        # Обязательные поля
-        required_fields = ['name', 'course', 'description', 'institution']
-        for field in required_fields:
-            if field not in data or not str(data.get(field, '')).strip():
-                print(f"❌ Отсутствует обязательное поле: {field}")
-                return jsonify({"error": f"Поле '{field}' обязательно"}), 400
+        # Выбор ID и сохранение под блокировкой, чтобы воркеры не выдали один ID дважды
+        with students_store.locked():
+            # Повторная проверка на актуальных данных: параллельный запрос
+            # того же студента мог создать карточку после первой проверки
+            if current_role != 'admin':
+                existing_card = students_store.find('userId', current_user_id)
+                if existing_card:
+                    return existing_card_response(existing_card)
 
-        students = load_data(STUDENTS_FILE)
+            # Генерируем новый ID
+            new_id = students_store.allocate_id()
 
-        # Генерируем новый ID
-        if students:
-            new_id = max([s.get('id', 0) for s in students], default=0) + 1
+            logger.debug("🆕 Создаем студента с ID: %s", new_id)
+
+            new_student = new_student_record(
+                data, new_id, current_user_id if current_role != 'admin' else None)
+
+            with metrics.timed('store_write'):
+                saved = students_store.put(new_student)
+            if saved:
+                change_feed.publish('created', students_store.version, id=new_id)
+                logger.info("✅ Добавлен студент: %s (ID: %s)", new_student['name'], new_id)
+                return jsonify(new_student), 201
+            else:
+                logger.error("❌ Ошибка сохранения в файл")
+                return jsonify({"error": "Ошибка сохранения"}), 500
+
+    except Exception as e:
+        logger.exception("❌ Ошибка создания студента: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/students/import', methods=['POST'])
+def import_students():
+    """Массовый импорт студентов из NDJSON или CSV (только для админа).
+
+    Тело запроса - файл (Content-Type text/csv или application/x-ndjson),
+    читается построчно из потока, или поле file формы. Каждая строка проверяется
+    так же, как при создании карточки. Строки с ошибками пропускаются
+    и перечисляются в ответе, остальные получают блок id подряд
+    и сохраняются одной записью в хранилище.
+    """
+    try:
+        if 'user_id' not in session:
+            return jsonify({"error": "Требуется авторизация"}), 401
+        if session.get('role') != 'admin':
+            return jsonify({"error": "Импорт доступен только администратору"}), 403
+
+        if request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+            upload = request.files.get('file')
+            if upload is None:
+                return jsonify({"error": "Файл не найден"}), 400
+            stream = upload.stream
+            fmt = import_format(upload.mimetype, upload.filename)
+        else:
+            stream = request.stream
+            fmt = import_format(request.content_type)
+        if request.args.get('format') in ('csv', 'ndjson'):
+            fmt = request.args['format']
+
+        valid, errors = [], []
+        try:
+            for line_number, data, error in parse_rows(stream, fmt):
+                # Типы полей проверяем до выделения id, чтобы строка не сорвала весь импорт
+                if not error:
+                    data, error = normalize_row(data)
+                error = error or validate_new_student(data)
+                if error:
+                    errors.append({"row": line_number, "error": error})
+                else:
+                    valid.append(data)
+        except UnicodeDecodeError:
+            return jsonify({"error": "Файл должен быть в кодировке UTF-8"}), 400
+
+        if not valid:
+            return jsonify({"error": "Нет строк для импорта", "imported": 0, "errors": errors}), 400
+
+        with students_store.locked():
+            ids = students_store.allocate_ids(len(valid))
+            students = [new_student_record(data, new_id, None) for data, new_id in zip(valid, ids)]
+            with metrics.timed('store_write'):
+                saved = students_store.put_many(students)
+            if saved:
+                change_feed.publish('imported', students_store.version, firstId=ids[0],
+                                    lastId=ids[-1], count=len(students))
+        if not saved:
+            return jsonify({"error": "Ошибка сохранения"}), 500
+
+        logger.info("📥 Импортировано студентов: %s (строк с ошибками: %s)", len(students), len(errors))
+        return jsonify({
+            "success": True,
+            "imported": len(students),
+            "firstId": ids[0],
+            "lastId": ids[-1],
+            "errors": errors
+        }), 201
+    except Exception as e:
+        logger.exception("❌ Ошибка импорта студентов: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/students/batch', methods=['GET', 'POST'])
+def get_students_batch():
+    """Несколько карточек за один запрос: ?ids=1,2,3 или POST {"ids": [...]}.
+
+    Ответ: {"students": {"<id>": карточка}, "missing": [id, ...]}.
+    """
+    try:
+        if request.method == 'POST':
+            raw_ids = (request.get_json(silent=True) or {}).get('ids')
         else:
-            new_id = 1
-
-        print(f"🆕 Создаем студента с ID: {new_id}")
-
-        new_student = {
-            "id": new_id,
-            "name": data.get('name', '').strip(),
-            "course": int(data.get('course', 1)),
-            "status": data.get('status', 'studying'),
-            "description": data.get('description', '').strip(),
-            "fullInfo": data.get('fullInfo', data.get('description', '').strip()),
-            "institution": data.get('institution', '').strip(),
-            "skills": data.get('skills', []),
-            "links": data.get('links', {}),
-            "photo": data.get('photo', '/images/default.jpg'),
-            "createdAt": datetime.now().isoformat(),
-            "updatedAt": datetime.now().isoformat(),
-            "userId": current_user_id if current_role != 'admin' else None
-        }
-
-        students.append(new_student)
-
-        if save_data(STUDENTS_FILE, students):
-            print(f"✅ Добавлен студент: {new_student['name']} (ID: {new_id})")
-            return jsonify(new_student), 201
+            raw_ids = request.args.get('ids', '').split(',')
+        if not isinstance(raw_ids, list):
+            return jsonify({"error": "ids должен быть списком"}), 400
+        if any(isinstance(value, bool) for value in raw_ids):
+            return jsonify({"error": "ids должны быть числами"}), 400
+        try:
+            ids = list(dict.fromkeys(int(value) for value in raw_ids if str(value).strip()))
+        except (TypeError, ValueError):
+            return jsonify({"error": "ids должны быть числами"}), 400
+        if not ids:
+            return jsonify({"error": "Не указаны ids"}), 400
+        if len(ids) > app.config['MAX_BATCH_SIZE']:
+            return jsonify({"error": f"Не больше {app.config['MAX_BATCH_SIZE']} карточек за запрос"}), 400
+
+        etag = dataset_etag(per_user=False) if request.method == 'GET' else None
+        if etag:
+            cached = not_modified(etag)
+            if cached:
+                return cached
+
+        found = {}
+        missing = []
+        for student_id in ids:
+            student = students_store.get(student_id)
+            if student is None:
+                missing.append(student_id)
+            else:
+                found[str(student_id)] = student
+
+        response = jsonify({"students": found, "missing": missing})
+        return with_etag(response, etag) if etag else response
+    except Exception as e:
+        logger.exception("❌ Ошибка пакетного получения студентов: %s", e)
+        return jsonify({"error": "Внутренняя ошибка сервера"}), 500
+
+
+@app.route('/api/students/batch', methods=['PATCH'])
+def update_students_batch():
+    """Изменение нескольких карточек одной записью (только для админа).
+
+    Тело: {"updates": [{"id": 1, "status": "graduated"}, ...]} или
+    {"ids": [1, 2], "changes": {"status": "graduated"}}. Поля проверяются
+    так же, как в PUT /api/students/<id>. Если какая-то карточка не найдена
+    или не прошла проверку, не сохраняется ничего.
+    """
+    try:
+        if 'user_id' not in session:
+            return jsonify({"error": "Требуется авторизация"}), 401
+        if session.get('role') != 'admin':
+            return jsonify({"error": "Массовое изменение доступно только администратору"}), 403
+
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Нет данных"}), 400
+        if 'updates' in data:
+            updates = data['updates']
         else:
-            print("❌ Ошибка сохранения в файл")
+            changes = data.get('changes')
+            ids = data.get('ids')
+            if not isinstance(changes, dict) or not isinstance(ids, list):
+                return jsonify({"error": "Нужны updates или ids и changes"}), 400
+            updates = [dict(changes, id=student_id) for student_id in ids]
+        if not isinstance(updates, list) or not updates:
+            return jsonify({"error": "Нет изменений"}), 400
+        if len(updates) > app.config['MAX_BATCH_SIZE']:
+            return jsonify({"error": f"Не больше {app.config['MAX_BATCH_SIZE']} карточек за запрос"}), 400
+        # bool - подкласс int: {"id": true} не должен менять карточку 1
+        if not all(isinstance(update, dict) and isinstance(update.get('id'), int)
+                   and not isinstance(update.get('id'), bool) for update in updates):
+            return jsonify({"error": "Каждое изменение - объект с числовым id"}), 400
+
+        with students_store.locked():
+            changed = {}
+            missing = []
+            errors = []
+            now = datetime.now().isoformat()
+            for update in updates:
+                student_id = update['id']
+                # Повторный id правит уже измененную копию
+                student = changed.get(student_id)
+                if student is None:
+                    student = students_store.get(student_id)
+                    if student is None:
+                        missing.append(student_id)
+                        continue
+                    student = dict(student)
+                error = apply_student_changes(student, update)
+                if error:
+                    errors.append({"id": student_id, "error": error})
+                    continue
+                student['updatedAt'] = now
+                changed[student_id] = student
+
+            if missing or errors:
+                return jsonify({"error": "Изменения не сохранены", "missing": missing,
+                                "errors": errors}), 400
+
+            with metrics.timed('store_write'):
+                saved = students_store.put_many(list(changed.values()))
+            if saved:
+                change_feed.publish('updated', students_store.version, ids=list(changed))
+        if not saved:
             return jsonify({"error": "Ошибка сохранения"}), 500
 
+        logger.info("✅ Изменено студентов одним пакетом: %s", len(changed))
+        return jsonify({"success": True, "updated": len(changed), "students": list(changed.values())})
     except Exception as e:
-        print(f"❌ Ошибка создания студента: {e}")
+        logger.exception("❌ Ошибка пакетного изменения студентов: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -581,7 +1203,7 @@ def create_student():
 def update_student(student_id):
     """Обновить данные студента"""
     try:
-        print(f"✏️ Получен запрос на обновление студента ID: {student_id}")
+        logger.debug("✏️ Получен запрос на обновление студента ID: %s", student_id)
 
         # Проверяем авторизацию
         if 'user_id' not in session:
@@ -630,78 +1252,39 @@ def update_student(student_id):
         if not data:
             return jsonify({"error": "Нет данных"}), 400
 
-        students = load_data(STUDENTS_FILE)
-
-        # Находим студента
-        student_index = None
-        for i, student in enumerate(students):
-            if student.get('id') == student_id:
-                student_index = i
-                break
-
-        if student_index is None:
-            return jsonify({"error": "Студент не найден"}), 404
-
-        # Проверяем права на редактирование
-        student = students[student_index]
-
-        # Админ может редактировать все карточки
-        if current_role != 'admin':
-            # Студент может редактировать только свою карточку
-            if student.get('userId') != current_user_id:
-                return jsonify({"error": "Вы можете редактировать только свою карточку"}), 403
-
-        # Проверяем обязательные поля
-        required_fields = ['name', 'course', 'description', 'institution']
-        for field in required_fields:
-            if field in data and not str(data.get(field, '')).strip():
-                return jsonify({"error": f"Поле '{field}' не может быть пустым"}), 400
-
-        # Обновляем данные
-        updatable_fields = ['name', 'course', 'status', 'description', 'fullInfo',
-                            'institution', 'skills', 'links', 'photo']
-
-        for field in updatable_fields:
-            if field in data:
-                if field == 'course':
-                    try:
-                        student[field] = int(data[field])
-                    except:
-                        student[field] = 1
-                elif field == 'photo' and (data[field] == '' or data[field] is None):
-                    # Если фото очищено, ставим дефолтное
-                    student[field] = '/images/default.jpg'
-                elif field == 'skills':
-                    # Обрабатываем навыки
-                    if isinstance(data[field], str):
-                        student[field] = [skill.strip() for skill in data[field].split(',') if skill.strip()]
-                    else:
-                        student[field] = data[field]
-                elif field == 'links':
-                    # Обрабатываем ссылки
-                    if isinstance(data[field], dict):
-                        student[field] = data[field]
-                    else:
-                        try:
-                            student[field] = json.loads(data[field]) if data[field] else {}
-                        except:
-                            student[field] = {}
-                elif field == 'institution':
-                    # Образовательное учреждение
-                    student[field] = data[field].strip()
-                else:
-                    student[field] = data[field]
-
-        student['updatedAt'] = datetime.now().isoformat()
-
-        if save_data(STUDENTS_FILE, students):
-            print(f"✅ Обновлен студент: {student['name']} (ID: {student_id})")
-            return jsonify(student)
-        else:
-            return jsonify({"error": "Ошибка сохранения"}), 500
+        # Читаем и сохраняем запись под блокировкой, чтобы не затереть чужие изменения
+        with students_store.locked():
+            # Находим студента
+            student = students_store.get(student_id)
+            if student is None:
+                return jsonify({"error": "Студент не найден"}), 404
+
+            # Проверяем права на редактирование (правим копию записи, а не кэш)
+            student = dict(student)
+
+            # Админ может редактировать все карточки
+            if current_role != 'admin':
+                # Студент может редактировать только свою карточку
+                if student.get('userId') != current_user_id:
+                    return jsonify({"error": "Вы можете редактировать только свою карточку"}), 403
+
+            error = apply_student_changes(student, data)
+            if error:
+                return jsonify({"error": error}), 400
+
+            student['updatedAt'] = datetime.now().isoformat()
+
+            with metrics.timed('store_write'):
+                saved = students_store.put(student)
+            if saved:
+                change_feed.publish('updated', students_store.version, id=student_id)
+                logger.info("✅ Обновлен студент: %s (ID: %s)", student['name'], student_id)
+                return jsonify(student)
+            else:
+                return jsonify({"error": "Ошибка сохранения"}), 500
 
     except Exception as e:
-        print(f"❌ Ошибка обновления студента: {e}")
+        logger.exception("❌ Ошибка обновления студента: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -716,40 +1299,41 @@ def delete_student(student_id):
         current_user_id = session['user_id']
         current_role = session.get('role', 'student')
 
-        students = load_data(STUDENTS_FILE)
-
-        # Находим студента
-        student = next((s for s in students if s.get('id') == student_id), None)
-        if not student:
-            return jsonify({"error": "Студент не найден"}), 404
-
-        # Проверяем права на удаление
-        if current_role != 'admin':
-            # Студент может удалять только свою карточку
-            if student.get('userId') != current_user_id:
-                return jsonify({"error": "Вы можете удалять только свою карточку"}), 403
-
-        # Удаляем фотографию студента если она не дефолтная
-        if student.get('photo') and not student['photo'].endswith('default.jpg'):
-            try:
-                photo_path = os.path.join('public', student['photo'].lstrip('/'))
-                if os.path.exists(photo_path):
-                    os.remove(photo_path)
-                    print(f"✅ Удалена фотография: {photo_path}")
-            except Exception as e:
-                print(f"⚠️ Не удалось удалить фотографию: {e}")
-
-        # Удаляем студента
-        students = [s for s in students if s.get('id') != student_id]
-
-        if save_data(STUDENTS_FILE, students):
-            print(f"✅ Удален студент ID: {student_id}")
-            return jsonify({"success": True, "message": "Студент удален"})
-        else:
-            return jsonify({"error": "Ошибка сохранения"}), 500
+        with students_store.locked():
+            # Находим студента
+            student = students_store.get(student_id)
+            if not student:
+                return jsonify({"error": "Студент не найден"}), 404
+
+            # Проверяем права на удаление
+            if current_role != 'admin':
+                # Студент может удалять только свою карточку
+                if student.get('userId') != current_user_id:
+                    return jsonify({"error": "Вы можете удалять только свою карточку"}), 403
+
+            # Удаляем фотографию студента если она не дефолтная
+            if student.get('photo') and not student['photo'].endswith('default.jpg'):
+                try:
+                    photo_path = os.path.join('public', student['photo'].lstrip('/'))
+                    if os.path.exists(photo_path):
+                        remove_thumbnails(app.config['THUMBNAIL_FOLDER'], photo_path)
+                        os.remove(photo_path)
+                        logger.info("✅ Удалена фотография: %s", photo_path)
+                except Exception as e:
+                    logger.warning("⚠️ Не удалось удалить фотографию: %s", e)
+
+            # Удаляем студента
+            with metrics.timed('store_write'):
+                saved = students_store.delete(student_id)
+            if saved:
+                change_feed.publish('deleted', students_store.version, id=student_id)
+                logger.info("✅ Удален студент ID: %s", student_id)
+                return jsonify({"success": True, "message": "Студент удален"})
+            else:
+                return jsonify({"error": "Ошибка сохранения"}), 500
 
     except Exception as e:
-        print(f"❌ Ошибка удаления студента: {e}")
+        logger.exception("❌ Ошибка удаления студента: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -760,14 +1344,15 @@ def delete_photo(filename):
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
 
         if os.path.exists(file_path):
+            remove_thumbnails(app.config['THUMBNAIL_FOLDER'], file_path)
             os.remove(file_path)
-            print(f"✅ Удалена фотография: {file_path}")
+            logger.info("✅ Удалена фотография: %s", file_path)
             return jsonify({"success": True, "message": "Фотография удалена"})
         else:
             return jsonify({"error": "Файл не найден"}), 404
 
     except Exception as e:
-        print(f"❌ Ошибка удаления фотографии: {e}")
+        logger.exception("❌ Ошибка удаления фотографии: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -785,8 +1370,7 @@ def login():
         if not username or not password:
             return jsonify({"error": "Логин и пароль обязательны"}), 400
 
-        users = load_data(USERS_FILE)
-        user = next((u for u in users if u.get('username') == username), None)
+        user = users_store.find('username', username)
 
         if user:
             password_hash = hashlib.sha256(password.encode()).hexdigest()
@@ -802,7 +1386,7 @@ def login():
                     "email": user.get('email')
                 }
 
-                print(f"✅ Успешный вход: {username}")
+                logger.info("✅ Успешный вход: %s", username)
                 return jsonify(user_data)
             else:
                 return jsonify({"error": "Неверный логин или пароль"}), 401
@@ -810,14 +1394,14 @@ def login():
             return jsonify({"error": "Неверный логин или пароль"}), 401
 
     except Exception as e:
-        print(f"❌ Ошибка входа: {e}")
+        logger.exception("❌ Ошибка входа: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
 @app.route('/api/logout', methods=['POST'])
 def logout():
     """Выход из системы"""
-    print("🚪 POST /api/logout - выход из системы")
+    logger.debug("🚪 POST /api/logout - выход из системы")
     session.clear()
     return jsonify({"message": "Успешный выход"})
 
@@ -826,8 +1410,7 @@ def logout():
 def get_current_user():
     """Получить текущего пользователя"""
     if 'user_id' in session:
-        users = load_data(USERS_FILE)
-        user = next((u for u in users if u.get('id') == session['user_id']), None)
+        user = users_store.get(session['user_id'])
 
         if user:
             return jsonify({
@@ -848,17 +1431,16 @@ def get_my_student():
             return jsonify({"error": "Требуется авторизация"}), 401
 
         current_user_id = session['user_id']
-        students = load_data(STUDENTS_FILE)
 
         # Ищем карточку пользователя
-        student = next((s for s in students if s.get('userId') == current_user_id), None)
+        student = students_store.find('userId', current_user_id)
 
         if not student:
             return jsonify({"error": "У вас еще нет карточки"}), 404
 
         return jsonify(student)
     except Exception as e:
-        print(f"❌ Ошибка получения карточки пользователя: {e}")
+        logger.exception("❌ Ошибка получения карточки пользователя: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -884,45 +1466,42 @@ def register():
         if len(password) < 6:
             return jsonify({"error": "Пароль должен содержать минимум 6 символов"}), 400
 
-        users = load_data(USERS_FILE)
+        # Проверка логина и выбор ID под блокировкой, чтобы воркеры не выдали один ID дважды
+        with users_store.locked():
+            # Проверяем, существует ли пользователь
+            if users_store.find('username', username) is not None:
+                return jsonify({"error": "Пользователь с таким логином уже существует"}), 400
 
-        # Проверяем, существует ли пользователь
-        if any(u.get('username') == username for u in users):
-            return jsonify({"error": "Пользователь с таким логином уже существует"}), 400
+            # Генерируем новый ID
+            new_id = users_store.allocate_id()
 
-        # Генерируем новый ID
-        if users:
-            new_id = max([u.get('id', 0) for u in users], default=0) + 1
-        else:
-            new_id = 1
-
-        # Хэшируем пароль
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
-
-        new_user = {
-            "id": new_id,
-            "username": username,
-            "password": password_hash,
-            "role": role,
-            "email": email,
-            "createdAt": datetime.now().isoformat()
-        }
-
-        users.append(new_user)
+            # Хэшируем пароль
+            password_hash = hashlib.sha256(password.encode()).hexdigest()
 
-        if save_data(USERS_FILE, users):
-            print(f"✅ Зарегистрирован пользователь: {username}")
-            return jsonify({
+            new_user = {
                 "id": new_id,
                 "username": username,
+                "password": password_hash,
                 "role": role,
-                "email": email
-            }), 201
-        else:
-            return jsonify({"error": "Ошибка сохранения"}), 500
+                "email": email,
+                "createdAt": datetime.now().isoformat()
+            }
+
+            with metrics.timed('store_write'):
+                saved = users_store.put(new_user)
+            if saved:
+                logger.info("✅ Зарегистрирован пользователь: %s", username)
+                return jsonify({
+                    "id": new_id,
+                    "username": username,
+                    "role": role,
+                    "email": email
+                }), 201
+            else:
+                return jsonify({"error": "Ошибка сохранения"}), 500
 
     except Exception as e:
-        print(f"❌ Ошибка регистрации: {e}")
+        logger.exception("❌ Ошибка регистрации: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -934,10 +1513,9 @@ def check_user_card():
             return jsonify({"hasCard": False}), 200
 
         current_user_id = session['user_id']
-        students = load_data(STUDENTS_FILE)
 
         # Ищем карточку пользователя
-        student = next((s for s in students if s.get('userId') == current_user_id), None)
+        student = students_store.find('userId', current_user_id)
 
         if student:
             return jsonify({
@@ -949,7 +1527,7 @@ def check_user_card():
             return jsonify({"hasCard": False})
 
     except Exception as e:
-        print(f"❌ Ошибка проверки карточки: {e}")
+        logger.exception("❌ Ошибка проверки карточки: %s", e)
         return jsonify({"hasCard": False, "error": str(e)}), 500
 
 
@@ -963,24 +1541,70 @@ def test_api():
     })
 
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Метрики запросов всех воркеров в формате Prometheus"""
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Проверка работоспособности"""
-    students = load_data(STUDENTS_FILE)
-    users = load_data(USERS_FILE)
+    students = students_store.load()
+    users = users_store.load()
 
     return jsonify({
         "status": "ok",
         "timestamp": datetime.now().isoformat(),
         "data_files": {
-            "students": os.path.exists(STUDENTS_FILE),
-            "users": os.path.exists(USERS_FILE)
+            "students": students_store.exists(),
+            "users": users_store.exists()
         },
         "data_counts": {
             "students": len(students),
             "users": len(users)
-        }
+        },
+        "query_cache": query_cache.stats()
+    })
+
+
+def store_health(store):
+    """Состояние хранилища для проверки готовности (время сохранения в ISO)"""
+    state = store.health()
+    if state["savedAt"] is not None:
+        state["savedAt"] = datetime.fromtimestamp(state["savedAt"]).isoformat()
+    return state
+
+
+@app.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    """Процесс жив и отвечает (без обращения к данным)"""
+    return jsonify({"status": "alive"})
+
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """Готовность принимать запросы: хранилища доступны и данные загружены.
+
+    Все значения берутся из памяти воркера, файлы данных не читаются.
+    """
+    storage = {
+        "students": store_health(students_store),
+        "users": store_health(users_store)
+    }
+    ready = all(state["ok"] and state["loaded"] for state in storage.values())
+    response = jsonify({
+        "status": "ready" if ready else "not_ready",
+        "timestamp": datetime.now().isoformat(),
+        "storage": storage,
+        "photoQueue": {
+            "depth": photo_processor.queue_depth(),
+            "capacity": photo_processor.max_queue
+        },
+        "changeSubscribers": change_feed.subscriber_count()
     })
+    response.headers['Cache-Control'] = 'no-store'
+    return response, 200 if ready else 503
 
 
 if __name__ == '__main__':
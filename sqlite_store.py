@@ -0,0 +1,494 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class SqliteStore:
+    """Хранилище записей в таблице SQLite с тем же интерфейсом, что у JsonStore.
+
+    Запись хранится целиком в колонке data (JSON), а поля из index_fields
+    дублируются в отдельные колонки с индексами. Для полей из search_fields
+    ведется таблица FTS5 с токенизатором trigram (поиск по подстроке).
+    База работает в режиме WAL: читатели не ждут писателей.
+
+    Как и JsonStore, хранилище держит копию записей в памяти процесса, чтобы
+    к нему можно было подключать индексы (add_index). Каждое изменение
+    получает номер из счетчика версии в таблице meta и запоминает его
+    в колонке seq, удаленные id попадают в <table>_deleted. Поэтому после
+    записи другим воркером из базы читаются только изменившиеся строки.
+    """
+
+    def __init__(self, database, table, index_fields=(), search_fields=()):
+        self.database = database
+        self.filename = database
+        self.table = table
+        self.index_fields = tuple(index_fields)
+        self.search_fields = tuple(search_fields)
+        self.version = 0
+        self._records = {}
+        self._list = []
+        self._indexes = []
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._local = threading.local()
+        self._schema_ready = False
+        # Время последнего успешного сохранения в этом процессе (time.time())
+        self.saved_at = None
+        # Функция (операция, секунды) для метрик времени перечитывания данных
+        self.timer = None
+
+    # ---------- соединение и схема ----------
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        # После fork соединение родителя использовать нельзя
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.database) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.database, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            if not self._schema_ready:
+                self._create_schema(conn)
+                self._schema_ready = True
+        return conn
+
+    def _create_schema(self, conn):
+        table = self.table
+        columns = ''.join(f', "{field}"' for field in self.index_fields)
+        conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {table} '
+                     f'(id INTEGER PRIMARY KEY, seq INTEGER NOT NULL, data TEXT NOT NULL{columns})')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_seq ON {table} (seq)')
+        for field in self.index_fields:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_{field} ON {table} ("{field}")')
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {table}_deleted '
+                     f'(id INTEGER PRIMARY KEY, seq INTEGER NOT NULL)')
+        if self.search_fields:
+            fields = ', '.join(self.search_fields)
+            conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts "
+                         f"USING fts5({fields}, tokenize='trigram')")
+
+    def _meta(self, conn, name):
+        row = conn.execute('SELECT value FROM meta WHERE name = ?',
+                           (f"{self.table}.{name}",)).fetchone()
+        return row[0] if row else 0
+
+    def _set_meta(self, conn, name, value):
+        conn.execute('INSERT INTO meta (name, value) VALUES (?, ?) '
+                     'ON CONFLICT(name) DO UPDATE SET value = excluded.value',
+                     (f"{self.table}.{name}", value))
+        return value
+
+    # ---------- чтение ----------
+
+    def load(self):
+        """Получить все записи (из памяти, если в базе ничего не менялось)"""
+        self.current_version()
+        data = self._list
+        if data is None:
+            with self._lock:
+                if self._list is None:
+                    self._list = list(self._records.values())
+                data = self._list
+        return data
+
+    def current_version(self):
+        """Актуальная версия данных (без сборки списка записей)"""
+        if self._loaded and self._meta(self._connection(), 'version') == self.version:
+            return self.version
+        with self._lock:
+            conn = self._connection()
+            if self._depth:
+                # Уже внутри locked() этого потока - транзакция открыта
+                self._refresh(conn)
+            else:
+                conn.execute('BEGIN')
+                try:
+                    self._refresh(conn)
+                finally:
+                    conn.execute('COMMIT')
+        return self.version
+
+    def get(self, record_id):
+        """Получить запись по id"""
+        self.load()
+        return self._records.get(record_id)
+
+    def find(self, field, value):
+        """Первая запись с заданным значением поля (по индексу в базе)"""
+        row = self._connection().execute(
+            f'SELECT data FROM {self.table} WHERE "{field}" = ? ORDER BY id LIMIT 1',
+            (value,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def match(self, text):
+        """id записей, в полях поиска которых встречается text (от 3 символов)"""
+        query = '"' + text.replace('"', '""') + '"'
+        rows = self._connection().execute(
+            f'SELECT rowid FROM {self.table}_fts WHERE {self.table}_fts MATCH ?', (query,))
+        return {row[0] for row in rows}
+
+    def changes_since(self, version, until=None):
+        """(измененные id, удаленные id) после версии version по seq и tombstones.
+
+        None, если данные после version перезаписывались целиком (save) -
+        тогда удаления неизвестны и нужна полная перезагрузка.
+        """
+        until = self.version if until is None else until
+        with self._lock:
+            conn = self._connection()
+            if self._depth:
+                # Уже внутри locked() этого потока - транзакция открыта
+                return self._changes_since(conn, version, until)
+            conn.execute('BEGIN')
+            try:
+                return self._changes_since(conn, version, until)
+            finally:
+                conn.execute('COMMIT')
+
+    def _changes_since(self, conn, version, until):
+        if self._meta(conn, 'reset') > version:
+            return None
+        changed = [row[0] for row in conn.execute(
+            f'SELECT id FROM {self.table} WHERE seq > ? AND seq <= ? ORDER BY seq, id',
+            (version, until))]
+        deleted = [row[0] for row in conn.execute(
+            f'SELECT id FROM {self.table}_deleted WHERE seq > ? AND seq <= ? ORDER BY seq, id',
+            (version, until))]
+        return changed, deleted
+
+    def count(self):
+        self.load()
+        return len(self._records)
+
+    def exists(self):
+        conn = self._connection()
+        row = conn.execute('SELECT 1 FROM meta WHERE name = ?', (f"{self.table}.version",)).fetchone()
+        return row is not None or conn.execute(f'SELECT 1 FROM {self.table} LIMIT 1').fetchone() is not None
+
+    def add_index(self, index):
+        """Подключить индекс, который обновляется вместе с данными"""
+        with self._lock:
+            self.current_version()
+            self._indexes.append(index)
+            index.rebuild(self._records.values())
+
+    def health(self):
+        """Состояние хранилища: данные в памяти и доступность базы"""
+        try:
+            self._connection().execute('SELECT 1').fetchone()
+            ok = True
+        except sqlite3.Error as e:
+            logger.warning("⚠️ База %s недоступна: %s", self.database, e)
+            ok = False
+        return {
+            "backend": "sqlite",
+            "ok": ok,
+            "loaded": self._loaded,
+            "records": len(self._records),
+            "version": self.version,
+            "savedAt": self.saved_at
+        }
+
+    def _refresh(self, conn):
+        version = self._meta(conn, 'version')
+        if self._loaded and version == self.version:
+            return
+
+        started = time.perf_counter()
+        if not self._loaded or self._meta(conn, 'reset') > self.version:
+            rows = conn.execute(f'SELECT data FROM {self.table} ORDER BY id')
+            records = (json.loads(data) for (data,) in rows)
+            self._records = {record.get('id'): record for record in records}
+            for index in self._indexes:
+                index.rebuild(self._records.values())
+        else:
+            # Читаем только строки, измененные после нашей версии
+            rows = conn.execute(f'SELECT data FROM {self.table} WHERE seq > ? ORDER BY id',
+                                (self.version,))
+            for (data,) in rows.fetchall():
+                self._apply_put(json.loads(data))
+            rows = conn.execute(f'SELECT id FROM {self.table}_deleted WHERE seq > ?',
+                                (self.version,))
+            for (record_id,) in rows.fetchall():
+                self._apply_delete(record_id)
+
+        self.version = version
+        self._list = None
+        self._loaded = True
+        if self.timer is not None:
+            self.timer('store_load', time.perf_counter() - started)
+
+    def _apply_put(self, record):
+        old = self._records.get(record.get('id'))
+        self._records[record.get('id')] = record
+        for index in self._indexes:
+            index.update(old, record)
+
+    def _apply_delete(self, record_id):
+        old = self._records.pop(record_id, None)
+        if old is not None:
+            for index in self._indexes:
+                index.update(old, None)
+
+    # ---------- блокировка и версия ----------
+
+    @contextmanager
+    def locked(self):
+        """Эксклюзивный доступ к данным для чтения-изменения-записи.
+
+        Внешний блок открывает транзакцию BEGIN IMMEDIATE и фиксирует ее
+        при выходе, вложенные блоки работают через SAVEPOINT. При ошибке
+        изменения откатываются, а копия в памяти перечитывается из базы.
+        """
+        with self._lock:
+            conn = self._connection()
+            savepoint = f"sp{self._depth}"
+            if self._depth == 0:
+                conn.execute('BEGIN IMMEDIATE')
+            else:
+                conn.execute(f'SAVEPOINT {savepoint}')
+            self._depth += 1
+            completed = False
+            try:
+                if self._depth == 1:
+                    self._refresh(conn)
+                yield self
+                completed = True
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        conn.execute('COMMIT' if completed else 'ROLLBACK')
+                    except sqlite3.Error:
+                        self._loaded = False
+                        if conn.in_transaction:
+                            conn.execute('ROLLBACK')
+                        raise
+                    if not completed:
+                        self._loaded = False
+                elif completed:
+                    conn.execute(f'RELEASE {savepoint}')
+                else:
+                    conn.execute(f'ROLLBACK TO {savepoint}')
+                    conn.execute(f'RELEASE {savepoint}')
+                    self._loaded = False
+
+    def _next_version(self, conn):
+        version = max(self._meta(conn, 'version'), self.version) + 1
+        self._set_meta(conn, 'version', version)
+        return version
+
+    def allocate_id(self):
+        """Выдать новый id (вызывать внутри locked())"""
+        return self.allocate_ids(1)[0]
+
+    def allocate_ids(self, count):
+        """Выдать блок из count идущих подряд id (вызывать внутри locked())"""
+        with self.locked():
+            conn = self._connection()
+            max_id = conn.execute(f'SELECT MAX(id) FROM {self.table}').fetchone()[0] or 0
+            last_id = max(self._meta(conn, 'last_id'), max_id)
+            self._set_meta(conn, 'last_id', last_id + count)
+            return range(last_id + 1, last_id + count + 1)
+
+    # ---------- запись ----------
+
+    def _row(self, record, version):
+        values = [record.get('id'), version,
+                  json.dumps(record, ensure_ascii=False, separators=(',', ':'))]
+        for field in self.index_fields:
+            value = record.get(field)
+            values.append(value if value is None or isinstance(value, (int, float)) else str(value))
+        return values
+
+    def _search_row(self, record):
+        values = [record.get('id')]
+        for field in self.search_fields:
+            value = record.get(field)
+            if isinstance(value, list):
+                value = '\n'.join(str(item) for item in value)
+            values.append(value or '')
+        return values
+
+    def _write_rows(self, conn, records, version):
+        columns = ['id', 'seq', 'data'] + [f'"{field}"' for field in self.index_fields]
+        updates = ', '.join(f'{column} = excluded.{column}' for column in columns[1:])
+        conn.executemany(
+            f'INSERT INTO {self.table} ({", ".join(columns)}) '
+            f'VALUES ({", ".join("?" * len(columns))}) ON CONFLICT(id) DO UPDATE SET {updates}',
+            [self._row(record, version) for record in records])
+        conn.executemany(f'DELETE FROM {self.table}_deleted WHERE id = ?',
+                         [(record.get('id'),) for record in records])
+        if self.search_fields:
+            conn.executemany(f'DELETE FROM {self.table}_fts WHERE rowid = ?',
+                             [(record.get('id'),) for record in records])
+            conn.executemany(
+                f'INSERT INTO {self.table}_fts (rowid, {", ".join(self.search_fields)}) '
+                f'VALUES ({", ".join("?" * (len(self.search_fields) + 1))})',
+                [self._search_row(record) for record in records])
+
+    def put(self, record):
+        """Добавить или заменить запись (по полю id)"""
+        try:
+            with self.locked():
+                conn = self._connection()
+                version = self._next_version(conn)
+                self._write_rows(conn, [record], version)
+                self._apply_put(record)
+                self._changed(version)
+            return True
+        except sqlite3.Error as e:
+            logger.error("❌ Ошибка записи в таблицу %s: %s", self.table, e)
+            return False
+
+    def put_many(self, records):
+        """Добавить или заменить несколько записей в одной транзакции"""
+        try:
+            with self.locked():
+                conn = self._connection()
+                version = self._next_version(conn)
+                self._write_rows(conn, records, version)
+                for record in records:
+                    self._apply_put(record)
+                self._changed(version)
+            return True
+        except sqlite3.Error as e:
+            logger.error("❌ Ошибка записи в таблицу %s: %s", self.table, e)
+            return False
+
+    def delete(self, record_id):
+        """Удалить запись по id"""
+        try:
+            with self.locked():
+                conn = self._connection()
+                version = self._next_version(conn)
+                conn.execute(f'DELETE FROM {self.table} WHERE id = ?', (record_id,))
+                conn.execute(f'INSERT INTO {self.table}_deleted (id, seq) VALUES (?, ?) '
+                             'ON CONFLICT(id) DO UPDATE SET seq = excluded.seq', (record_id, version))
+                if self.search_fields:
+                    conn.execute(f'DELETE FROM {self.table}_fts WHERE rowid = ?', (record_id,))
+                self._apply_delete(record_id)
+                self._changed(version)
+            return True
+        except sqlite3.Error as e:
+            logger.error("❌ Ошибка удаления из таблицы %s: %s", self.table, e)
+            return False
+
+    def save(self, data):
+        """Перезаписать все данные целиком"""
+        try:
+            with self.locked():
+                conn = self._connection()
+                version = self._next_version(conn)
+                conn.execute(f'DELETE FROM {self.table}')
+                conn.execute(f'DELETE FROM {self.table}_deleted')
+                if self.search_fields:
+                    conn.execute(f'DELETE FROM {self.table}_fts')
+                self._write_rows(conn, data, version)
+                # Остальные процессы должны перечитать таблицу целиком
+                self._set_meta(conn, 'reset', version)
+                self._records = {record.get('id'): record for record in data}
+                for index in self._indexes:
+                    index.rebuild(self._records.values())
+                self._changed(version)
+            return True
+        except sqlite3.Error as e:
+            logger.error("❌ Ошибка сохранения таблицы %s: %s", self.table, e)
+            return False
+
+    def save_stream(self, records, batch_size=1000):
+        """Перезаписать все данные записями из итератора, не собирая их в список.
+
+        Строки пишутся пачками по batch_size в одной транзакции, копия
+        в памяти перечитывается из базы при следующем обращении.
+        """
+        try:
+            with self.locked():
+                conn = self._connection()
+                version = self._next_version(conn)
+                conn.execute(f'DELETE FROM {self.table}')
+                conn.execute(f'DELETE FROM {self.table}_deleted')
+                if self.search_fields:
+                    conn.execute(f'DELETE FROM {self.table}_fts')
+                batch = []
+                for record in records:
+                    batch.append(record)
+                    if len(batch) >= batch_size:
+                        self._write_rows(conn, batch, version)
+                        batch = []
+                self._write_rows(conn, batch, version)
+                self._set_meta(conn, 'reset', version)
+                self._records = {}
+                self._loaded = False
+                self._changed(version)
+            return True
+        except sqlite3.Error as e:
+            logger.error("❌ Ошибка сохранения таблицы %s: %s", self.table, e)
+            return False
+
+    def compact(self):
+        """Перенести WAL в основной файл базы"""
+        try:
+            self._connection().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            return True
+        except sqlite3.Error as e:
+            logger.warning("⚠️ Не удалось выполнить checkpoint %s: %s", self.database, e)
+            return False
+
+    def _changed(self, version):
+        self.version = version
+        self._list = None
+        self.saved_at = time.time()
+
+
+class FullTextSearch:
+    """Поиск студентов по подстроке через FTS5 с интерфейсом SearchIndex.
+
+    Таблица FTS с токенизатором trigram дает кандидатов для запросов
+    от 3 символов, затем каждый кандидат проверяется обычным вхождением
+    подстроки в нижнем регистре, как в SearchIndex.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    @staticmethod
+    def _texts(record):
+        return (
+            (record.get('name') or '').lower(),
+            (record.get('description') or '').lower(),
+            (record.get('institution') or '').lower(),
+        ) + tuple((skill or '').lower() for skill in record.get('skills') or [])
+
+    def search(self, text):
+        """id записей, у которых text (уже в нижнем регистре) входит
+        в имя, описание, один из навыков или учреждение"""
+        self.store.current_version()
+        records = self.store._records
+        candidates = self.store.match(text) if len(text) >= 3 else list(records)
+        result = set()
+        for record_id in candidates:
+            record = records.get(record_id)
+            if record is not None and any(text in field for field in self._texts(record)):
+                result.add(record_id)
+        return result
+
+    def institution_matches(self, record_id, text):
+        """Входит ли text (в нижнем регистре) в название учреждения записи"""
+        record = self.store._records.get(record_id)
+        return record is not None and text in (record.get('institution') or '').lower()
+
+    def sort_key(self, record_id):
+        """Ключ сортировки по порядку записей в хранилище (по id)"""
+        return record_id
@@ -0,0 +1,529 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировки между процессами недоступны
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def load_data(filename):
+    """Загрузка данных из файла"""
+    try:
+        if os.path.exists(filename):
+            with open(filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return []
+    except Exception as e:
+        logger.error("❌ Ошибка загрузки %s: %s", filename, e)
+        return []
+
+
+def save_data(filename, data):
+    """Сохранение данных в файл (через временный файл, чтобы не обрезать его при сбое)"""
+    tmp_filename = f"{filename}.tmp"
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(tmp_filename, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+        return True
+    except Exception as e:
+        logger.error("❌ Ошибка сохранения %s: %s", filename, e)
+        return False
+
+
+def save_records(filename, records):
+    """Сохранение записей из итератора в JSON-массив без сборки списка в памяти"""
+    tmp_filename = f"{filename}.tmp"
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(tmp_filename, 'w', encoding='utf-8') as f:
+            f.write('[')
+            for i, record in enumerate(records):
+                f.write(',\n' if i else '\n')
+                f.write(json.dumps(record, ensure_ascii=False))
+            f.write('\n]\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+        return True
+    except Exception as e:
+        logger.error("❌ Ошибка сохранения %s: %s", filename, e)
+        return False
+
+
+def _file_stamp(filename):
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class FieldIndex:
+    """Хэш-индекс по значению поля: значение -> записи в порядке хранилища"""
+
+    def __init__(self, field):
+        self.field = field
+        self._buckets = {}
+
+    def rebuild(self, records):
+        buckets = {}
+        for record in records:
+            value = record.get(self.field)
+            if value is not None:
+                buckets.setdefault(value, {})[record.get('id')] = record
+        self._buckets = buckets
+
+    def update(self, old, new):
+        if old is not None and new is not None and old.get(self.field) == new.get(self.field):
+            # Значение поля не изменилось - заменяем запись на том же месте
+            bucket = self._buckets.get(new.get(self.field))
+            if bucket is not None:
+                bucket[new.get('id')] = new
+            return
+        if old is not None:
+            value = old.get(self.field)
+            bucket = self._buckets.get(value)
+            if bucket is not None:
+                bucket.pop(old.get('id'), None)
+                if not bucket:
+                    del self._buckets[value]
+        if new is not None:
+            value = new.get(self.field)
+            if value is not None:
+                self._buckets.setdefault(value, {})[new.get('id')] = new
+
+    def first(self, value):
+        bucket = self._buckets.get(value)
+        if not bucket:
+            return None
+        return next(iter(bucket.values()), None)
+
+
+class JsonStore:
+    """Кэш JSON-файла в памяти процесса.
+
+    Файл разбирается заново только если у него изменились mtime или размер.
+    Список, который возвращает load(), общий для всех запросов - его нельзя
+    изменять на месте, изменения сохраняются через put()/delete()/save().
+
+    В режиме журнала (journal=True) каждое изменение дописывается одной
+    строкой в файл <filename>.journal, а сам файл данных служит снимком.
+    При загрузке к снимку применяется хвост журнала, а после compact_every
+    записей журнал сворачивается в новый снимок.
+
+    Несколько процессов (воркеры gunicorn) работают с одними файлами:
+    изменения выполняются под блокировкой <filename>.lock (flock), а счетчик
+    версии лежит в <filename>.version, отображенном в память. Воркер сверяет
+    свою версию со счетчиком при каждом чтении и перечитывает файлы только
+    если она отстала. Правки файлов в обход хранилища замечаются по mtime
+    не позже чем через stat_interval секунд.
+
+    К хранилищу можно подключить индексы (add_index): у индекса вызывается
+    rebuild(records) при полной перезагрузке и update(old, new) при каждом
+    изменении записи (old или new равны None при добавлении и удалении).
+    Записи по id и по полям из index_fields ищутся через get() и find().
+
+    Новые id выдает allocate_id() из счетчика, который лежит в том же
+    отображенном файле, что и версия, поэтому id не повторяются между
+    воркерами и после удаления последней записи.
+    """
+
+    def __init__(self, filename, journal=False, compact_every=1000, stat_interval=1.0,
+                 index_fields=()):
+        self.filename = filename
+        self.journal_filename = f"{filename}.journal"
+        self.lock_filename = f"{filename}.lock"
+        self.version_filename = f"{filename}.version"
+        self.journal = journal
+        self.compact_every = compact_every
+        self.stat_interval = stat_interval
+        # Версия данных (общая для всех процессов): растет при каждом изменении
+        self.version = 0
+        self._records = {}
+        self._list = []
+        self._indexes = []
+        self._field_indexes = {}
+        for field in index_fields:
+            self._field_indexes[field] = FieldIndex(field)
+            self._indexes.append(self._field_indexes[field])
+        self._last_id = 0
+        self._snapshot_stamp = None
+        self._journal_stamp = None
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+        self._version_map = None
+        self._checked_at = 0.0
+        self._loaded = False
+        # Время последнего успешного сохранения в этом процессе (time.time())
+        self.saved_at = None
+        # Функция (операция, секунды) для метрик времени перечитывания данных
+        self.timer = None
+
+    # ---------- чтение ----------
+
+    def load(self):
+        """Получить данные (из кэша, если файлы не менялись)"""
+        self.current_version()
+        data = self._list
+        if data is None:
+            with self._lock:
+                if self._list is None:
+                    self._list = list(self._records.values())
+                data = self._list
+        return data
+
+    def current_version(self):
+        """Актуальная версия данных (без сборки списка записей)"""
+        if self._is_stale():
+            with self.locked():
+                pass
+        return self.version
+
+    def get(self, record_id):
+        """Получить запись по id"""
+        self.load()
+        return self._records.get(record_id)
+
+    def find(self, field, value):
+        """Первая запись с заданным значением индексированного поля"""
+        self.load()
+        return self._field_indexes[field].first(value)
+
+    def changes_since(self, version, until=None):
+        """Журнал не хранит версий записей - изменения ищет ModificationIndex"""
+        return None
+
+    def count(self):
+        self.load()
+        return len(self._records)
+
+    def exists(self):
+        return _file_stamp(self.filename) is not None
+
+    def add_index(self, index):
+        """Подключить индекс, который обновляется вместе с данными"""
+        with self._lock:
+            self._indexes.append(index)
+            index.rebuild(self._records.values())
+
+    def health(self):
+        """Состояние хранилища по данным в памяти, без чтения файлов"""
+        directory = os.path.dirname(self.filename) or '.'
+        return {
+            "backend": "journal" if self.journal else "snapshot",
+            "ok": self._version_map is not False and os.access(directory, os.W_OK),
+            "loaded": self._loaded,
+            "records": len(self._records),
+            "version": self.version,
+            "savedAt": self.saved_at
+        }
+
+    def _is_stale(self):
+        if self._read_version() != self.version:
+            return True
+        now = time.monotonic()
+        if now - self._checked_at < self.stat_interval:
+            return False
+        self._checked_at = now
+        return (_file_stamp(self.filename) != self._snapshot_stamp
+                or _file_stamp(self.journal_filename) != self._journal_stamp)
+
+    def _refresh(self):
+        snapshot_stamp = _file_stamp(self.filename)
+        journal_stamp = _file_stamp(self.journal_filename)
+        shared_version = self._read_version()
+        if snapshot_stamp == self._snapshot_stamp and journal_stamp == self._journal_stamp:
+            self.version = shared_version
+            self._loaded = True
+            return
+
+        started = time.perf_counter()
+        if (snapshot_stamp == self._snapshot_stamp and journal_stamp is not None
+                and journal_stamp[2] >= self._journal_offset):
+            # Снимок тот же, журнал дописан - применяем только новые записи
+            self._replay_journal(self._journal_offset)
+        else:
+            data = load_data(self.filename) or []
+            self._records = {record.get('id'): record for record in data}
+            self._journal_offset = 0
+            self._journal_entries = 0
+            if journal_stamp is not None:
+                self._replay_journal(0)
+            self._rebuild_indexes()
+
+        self._snapshot_stamp = snapshot_stamp
+        self._journal_stamp = journal_stamp
+        self._list = None
+        self._loaded = True
+        if shared_version == self.version:
+            # Файлы изменили в обход хранилища - сообщаем остальным процессам
+            shared_version = self._write_version(shared_version + 1)
+        self.version = shared_version
+        if self.timer is not None:
+            self.timer('store_load', time.perf_counter() - started)
+
+    def _replay_journal(self, offset):
+        try:
+            with open(self.journal_filename, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read()
+        except OSError as e:
+            logger.error("❌ Ошибка чтения журнала %s: %s", self.journal_filename, e)
+            return False
+
+        # Недописанную последнюю строку (сбой во время записи) пропускаем
+        end = chunk.rfind(b'\n') + 1
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                self._apply(json.loads(line))
+                self._journal_entries += 1
+            except Exception as e:
+                logger.warning("⚠️ Пропущена поврежденная запись журнала %s: %s", self.journal_filename, e)
+        self._journal_offset = offset + end
+        return True
+
+    def _apply(self, entry):
+        if entry['op'] == 'batch':
+            # Пакет изменений - одна строка журнала, применяется целиком
+            for change in entry['entries']:
+                self._apply(change)
+            return
+        if entry['op'] == 'put':
+            record = entry['record']
+            record_id = record.get('id')
+            old = self._records.get(record_id)
+            self._records[record_id] = record
+        elif entry['op'] == 'delete':
+            record = None
+            record_id = entry['id']
+            old = self._records.pop(record_id, None)
+            if old is None:
+                return
+        else:
+            return
+        if isinstance(record_id, int) and record_id > self._last_id:
+            self._last_id = record_id
+        for index in self._indexes:
+            index.update(old, record)
+
+    def _rebuild_indexes(self):
+        ids = [record_id for record_id in self._records if isinstance(record_id, int)]
+        self._last_id = max([self._last_id] + ids)
+        for index in self._indexes:
+            index.rebuild(self._records.values())
+
+    def _changed(self):
+        self._list = None
+        self.version = self._write_version(self._read_version() + 1)
+        self.saved_at = time.time()
+
+    # ---------- блокировка и версия ----------
+
+    @contextmanager
+    def locked(self):
+        """Эксклюзивный доступ к данным для чтения-изменения-записи.
+
+        Внутри блока данные актуальны, а другие потоки и процессы
+        не могут ничего сохранить. Блоки можно вкладывать друг в друга.
+        """
+        with self._lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                # Файл открываем заново: дескриптор, унаследованный при fork,
+                # разделял бы блокировку между воркерами
+                os.makedirs(os.path.dirname(self.lock_filename), exist_ok=True)
+                self._lock_file = open(self.lock_filename, 'a+b')
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                self._refresh()
+                self._checked_at = time.monotonic()
+                yield self
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_file is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _open_version_map(self):
+        try:
+            os.makedirs(os.path.dirname(self.version_filename), exist_ok=True)
+            fd = os.open(self.version_filename, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                # 8 байт версии и 8 байт счетчика id
+                if os.fstat(fd).st_size < 16:
+                    os.ftruncate(fd, 16)
+                self._version_map = mmap.mmap(fd, 16)
+            finally:
+                os.close(fd)
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️ Счетчик версии %s недоступен: %s", self.version_filename, e)
+            self._version_map = False
+
+    def _read_version(self):
+        if self._version_map is None:
+            self._open_version_map()
+        if not self._version_map:
+            return self.version
+        return struct.unpack_from('<Q', self._version_map)[0]
+
+    def _write_version(self, version):
+        if self._version_map:
+            struct.pack_into('<Q', self._version_map, 0, version)
+        return version
+
+    def allocate_id(self):
+        """Выдать новый id (вызывать внутри locked())"""
+        return self.allocate_ids(1)[0]
+
+    def allocate_ids(self, count):
+        """Выдать блок из count идущих подряд id (вызывать внутри locked())"""
+        with self.locked():
+            last_id = self._last_id
+            if self._version_map:
+                last_id = max(last_id, struct.unpack_from('<Q', self._version_map, 8)[0])
+            new_last_id = last_id + count
+            if self._version_map:
+                struct.pack_into('<Q', self._version_map, 8, new_last_id)
+            self._last_id = new_last_id
+            return range(last_id + 1, new_last_id + 1)
+
+    # ---------- запись ----------
+
+    def put(self, record):
+        """Добавить или заменить запись (по полю id)"""
+        return self._commit({"op": "put", "record": record})
+
+    def delete(self, record_id):
+        """Удалить запись по id"""
+        return self._commit({"op": "delete", "id": record_id})
+
+    def put_many(self, records):
+        """Добавить или заменить несколько записей одной записью в журнал"""
+        return self._commit({"op": "batch", "entries": [{"op": "put", "record": record}
+                                                         for record in records]})
+
+    def save(self, data):
+        """Перезаписать все данные целиком (новый снимок, журнал очищается)"""
+        with self.locked():
+            if not self._write_snapshot(data):
+                return False
+            self._records = {record.get('id'): record for record in data}
+            self._rebuild_indexes()
+            self._changed()
+            return True
+
+    def save_stream(self, records):
+        """Перезаписать все данные записями из итератора, не собирая их в список.
+
+        Копия в памяти не обновляется: новый снимок перечитывается
+        при следующем обращении к хранилищу.
+        """
+        with self.locked():
+            if not self._write_snapshot(records, saver=save_records):
+                return False
+            self._snapshot_stamp = None
+            self._write_version(self._read_version() + 1)
+            self.saved_at = time.time()
+            return True
+
+    def compact(self):
+        """Свернуть журнал в новый снимок"""
+        with self.locked():
+            if self._journal_stamp is None:
+                return True
+            if not self._write_snapshot(list(self._records.values())):
+                return False
+            # Данные те же, но другим процессам нужно перечитать новый снимок
+            self._changed()
+            return True
+
+    def _commit(self, entry):
+        with self.locked():
+            if self.journal:
+                if not self._append_journal(entry):
+                    return False
+            else:
+                records = dict(self._records)
+                for change in entry['entries'] if entry['op'] == 'batch' else [entry]:
+                    if change['op'] == 'put':
+                        records[change['record'].get('id')] = change['record']
+                    else:
+                        records.pop(change['id'], None)
+                if not self._write_snapshot(list(records.values())):
+                    return False
+            self._apply(entry)
+            self._changed()
+
+            if self.journal and self._journal_entries >= self.compact_every:
+                self.compact()
+            return True
+
+    def _append_journal(self, entry):
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+        try:
+            os.makedirs(os.path.dirname(self.journal_filename), exist_ok=True)
+            stamp = _file_stamp(self.journal_filename)
+            if stamp is not None and stamp[2] > self._journal_offset:
+                # Записи других процессов сначала дочитываем до конца
+                if not self._replay_journal(self._journal_offset):
+                    return False
+                self._list = None
+            with open(self.journal_filename, 'ab') as f:
+                if f.tell() != self._journal_offset:
+                    # Отрезать можно только недописанную последнюю строку (сбой
+                    # во время записи): в ней нет перевода строки
+                    with open(self.journal_filename, 'rb') as tail_file:
+                        tail_file.seek(self._journal_offset)
+                        tail = tail_file.read()
+                    if f.tell() < self._journal_offset or b'\n' in tail:
+                        logger.error("❌ Журнал %s изменился в обход блокировки", self.journal_filename)
+                        return False
+                    logger.warning("⚠️ Отрезан недописанный хвост журнала %s (%s байт)",
+                                   self.journal_filename, len(tail))
+                    f.truncate(self._journal_offset)
+                f.write(line.encode('utf-8'))
+                f.flush()
+                # Запись подтверждается клиенту только после сброса на диск
+                os.fsync(f.fileno())
+                self._journal_offset = f.tell()
+        except Exception as e:
+            logger.error("❌ Ошибка записи в журнал %s: %s", self.journal_filename, e)
+            return False
+
+        self._journal_entries += 1
+        self._journal_stamp = _file_stamp(self.journal_filename)
+        return True
+
+    def _write_snapshot(self, data, saver=save_data):
+        if not saver(self.filename, data):
+            return False
+        # Снимок уже содержит все изменения из журнала
+        try:
+            if os.path.exists(self.journal_filename):
+                os.remove(self.journal_filename)
+        except OSError as e:
+            logger.warning("⚠️ Не удалось очистить журнал %s: %s", self.journal_filename, e)
+        self._snapshot_stamp = _file_stamp(self.filename)
+        self._journal_stamp = None
+        self._journal_offset = 0
+        self._journal_entries = 0
+        return True
@@ -0,0 +1,153 @@
+import csv
+import io
+import json
+from itertools import islice
+
+# Колонки CSV: поля карточки, навыки через запятую, ссылки - отдельными колонками
+CSV_FIELDS = ['id', 'name', 'course', 'status', 'description', 'fullInfo', 'institution',
+              'skills', 'github', 'portfolio', 'linkedin', 'photo', 'userId',
+              'createdAt', 'updatedAt']
+LINK_FIELDS = ('github', 'portfolio', 'linkedin')
+# Текстовые поля карточки; необязательные без значения при импорте пропускаются
+TEXT_FIELDS = ('name', 'description', 'institution', 'fullInfo', 'status', 'photo')
+OPTIONAL_FIELDS = ('fullInfo', 'status', 'photo')
+# Сколько записей сериализуется в одну порцию потокового ответа
+EXPORT_BATCH_SIZE = 500
+
+
+def import_format(content_type, filename=None):
+    """Формат импорта (csv или ndjson) по имени файла или Content-Type"""
+    if filename:
+        return 'csv' if filename.lower().endswith('.csv') else 'ndjson'
+    return 'csv' if 'csv' in (content_type or '') else 'ndjson'
+
+
+def _csv_row(row):
+    """Строка CSV в данные карточки в том же виде, что у формы"""
+    data = {key: (value or '').strip() for key, value in row.items()
+            if key in CSV_FIELDS and key not in LINK_FIELDS}
+    for field in OPTIONAL_FIELDS:
+        if field in data and not data[field]:
+            del data[field]
+    if 'skills' in data:
+        data['skills'] = [skill.strip() for skill in data['skills'].split(',') if skill.strip()]
+    links = {field: (row.get(field) or '').strip() or None for field in LINK_FIELDS if field in row}
+    if links:
+        data['links'] = links
+    return data
+
+
+def _text_lines(stream):
+    # Строки двоичного потока в UTF-8 по мере чтения (BOM в начале пропускается);
+    # при неверной кодировке - UnicodeDecodeError
+    for number, line in enumerate(iter(stream.readline, b'')):
+        text = line.decode('utf-8')
+        yield text[1:] if number == 0 and text.startswith('\ufeff') else text
+
+
+def parse_rows(stream, fmt):
+    """Строки импорта из двоичного потока, по мере чтения:
+    (номер строки, данные или None, ошибка разбора или None)"""
+    lines = _text_lines(stream)
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, "Лишние значения в строке"
+            elif any((value or '').strip() for value in row.values()):
+                yield reader.line_num, _csv_row(row), None
+        return
+
+    for line_number, line in enumerate(lines, 1):
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Некорректный JSON: {e}"
+            continue
+        if not isinstance(data, dict):
+            yield line_number, None, "Ожидается JSON-объект"
+            continue
+        yield line_number, data, None
+
+
+def normalize_row(data):
+    """Привести типы полей строки импорта к виду формы: (данные, ошибка или None)"""
+    data = dict(data)
+    for field in TEXT_FIELDS:
+        value = data.get(field)
+        if field in OPTIONAL_FIELDS and (value is None or value == ''):
+            data.pop(field, None)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            data[field] = str(value)
+        elif field in data and not isinstance(value, str):
+            return None, f"Поле '{field}' должно быть строкой"
+
+    skills = data.get('skills')
+    if isinstance(skills, str):
+        data['skills'] = [skill.strip() for skill in skills.split(',') if skill.strip()]
+    elif isinstance(skills, list):
+        if not all(isinstance(skill, str) for skill in skills):
+            return None, "Поле 'skills' должно быть списком строк"
+        data['skills'] = [skill.strip() for skill in skills if skill.strip()]
+    elif skills is not None:
+        return None, "Поле 'skills' должно быть списком строк"
+    else:
+        data.pop('skills', None)
+
+    links = data.get('links')
+    if links is None:
+        data.pop('links', None)
+    elif not isinstance(links, dict) or not all(
+            value is None or isinstance(value, str) for value in links.values()):
+        return None, "Поле 'links' должно быть объектом со ссылками"
+    return data, None
+
+
+def _batches(students, batch_size):
+    # Порции из любого итератора: записи читаются по мере отправки
+    students = iter(students)
+    while True:
+        batch = list(islice(students, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def export_ndjson(students, batch_size=EXPORT_BATCH_SIZE):
+    """Выгрузка в NDJSON порциями: по одной записи на строку"""
+    for batch in _batches(students, batch_size):
+        yield ''.join(json.dumps(student, ensure_ascii=False) + '\n'
+                      for student in batch).encode('utf-8')
+
+
+def _csv_values(student):
+    links = student.get('links') or {}
+    values = []
+    for field in CSV_FIELDS:
+        if field in LINK_FIELDS:
+            value = links.get(field) if isinstance(links, dict) else None
+        elif field == 'skills':
+            skills = student.get('skills') or []
+            value = ', '.join(skills) if isinstance(skills, list) else skills
+        else:
+            value = student.get(field)
+        values.append('' if value is None else value)
+    return values
+
+
+def export_csv(students, batch_size=EXPORT_BATCH_SIZE):
+    """Выгрузка в CSV порциями (с BOM, чтобы Excel понял кодировку)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(CSV_FIELDS)
+    for batch in _batches(students, batch_size):
+        writer.writerows(_csv_values(student) for student in batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
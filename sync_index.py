@@ -0,0 +1,147 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+# Метка раньше любой даты: для записей без updatedAt
+MIN_STAMP = datetime.min.isoformat(timespec='microseconds')
+
+
+def normalize_stamp(value):
+    """Время ISO в едином виде (с микросекундами, локальное) или None"""
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment.isoformat(timespec='microseconds')
+
+
+class ModificationIndex:
+    """Записи в порядке изменения - для выдачи изменений с момента since.
+
+    Каждое изменение получает метку времени: обычно updatedAt записи,
+    но метки строго растут в порядке применения изменений, поэтому если
+    updatedAt не больше последней метки (старые данные, правка в обход
+    API), берется последняя метка + 1 мкс. Удаленные id остаются как
+    tombstones с меткой момента удаления. Пары (метка, id) дописываются
+    в конец списка, поэтому он отсортирован и since ищется через bisect;
+    устаревшие пары (id изменили еще раз) пропускаются и вычищаются,
+    когда их становится больше, чем живых.
+
+    Об удалениях до запуска процесса индекс не знает: после первой
+    загрузки хранилища (mark_loaded) floor - последняя метка, и для since
+    раньше floor изменения не выдаются (нужна полная перезагрузка). Так же
+    floor поднимается, когда старые tombstones вытесняются (max_tombstones).
+    """
+
+    def __init__(self, max_tombstones=10000, max_versions=1000):
+        self.max_tombstones = max_tombstones
+        self.max_versions = max_versions
+        self.floor = None
+        self.high_water = MIN_STAMP
+        self._log = []
+        self._stamps = {}
+        self._records = {}
+        self._deleted = set()
+        self._stale = 0
+        self._versions = []
+
+    # ---------- интерфейс индекса хранилища ----------
+
+    def rebuild(self, records):
+        records = {record.get('id'): record for record in records}
+        for record_id in [record_id for record_id in self._records if record_id not in records]:
+            self._touch(record_id, None, None)
+        # Полная перезагрузка (снимок после сжатия журнала, перезапись данных):
+        # метки получают только записи, которые действительно изменились
+        changed = [record for record_id, record in records.items()
+                   if self._records.get(record_id) != record]
+        changed.sort(key=lambda record: normalize_stamp(record.get('updatedAt')) or MIN_STAMP)
+        for record in changed:
+            self._touch(record.get('id'), record, record.get('updatedAt'))
+
+    def update(self, old, new):
+        if new is not None:
+            self._touch(new.get('id'), new, new.get('updatedAt'))
+        elif old is not None:
+            self._touch(old.get('id'), None, None)
+
+    def _touch(self, record_id, record, updated_at):
+        stamp = normalize_stamp(updated_at)
+        if stamp is None or stamp <= self.high_water:
+            moment = datetime.fromisoformat(self.high_water) + timedelta(microseconds=1)
+            stamp = moment.isoformat(timespec='microseconds')
+        self.high_water = stamp
+
+        if record_id in self._stamps:
+            self._stale += 1
+        self._stamps[record_id] = stamp
+        self._log.append((stamp, record_id))
+        if record is None:
+            self._records.pop(record_id, None)
+            self._deleted.add(record_id)
+        else:
+            self._records[record_id] = record
+            self._deleted.discard(record_id)
+
+        if self._stale > len(self._stamps):
+            self._compact()
+
+    def _compact(self):
+        log = [(stamp, record_id) for stamp, record_id in self._log
+               if self._stamps.get(record_id) == stamp]
+        # Старые tombstones вытесняем - раньше их меток изменения не выдаются
+        excess = len(self._deleted) - self.max_tombstones
+        if excess > 0:
+            for stamp, record_id in log:
+                if excess <= 0:
+                    break
+                if record_id in self._deleted:
+                    self._deleted.discard(record_id)
+                    del self._stamps[record_id]
+                    self.floor = max(self.floor or MIN_STAMP, stamp)
+                    excess -= 1
+            log = [(stamp, record_id) for stamp, record_id in log if record_id in self._stamps]
+        self._log = log
+        self._stale = 0
+
+    def mark_loaded(self):
+        """Хранилище загружено: все, что есть в индексе, было до запуска процесса"""
+        if self.floor is None:
+            self.floor = self.high_water
+
+    # ---------- версии ----------
+
+    def mark(self, version):
+        """Запомнить, что все изменения до версии version уже применены"""
+        if not self._versions or version > self._versions[-1][0]:
+            self._versions.append((version, self.high_water))
+            if len(self._versions) > self.max_versions:
+                del self._versions[:len(self._versions) - self.max_versions]
+
+    def marked(self, version):
+        """Версия (или более новая) уже связана с меткой"""
+        return bool(self._versions) and self._versions[-1][0] >= version
+
+    def stamp_for_version(self, version):
+        """Метка, после которой идут все изменения новее version, или None"""
+        i = bisect_left(self._versions, (version + 1,)) - 1
+        return self._versions[i][1] if i >= 0 else None
+
+    # ---------- выдача ----------
+
+    def changes_since(self, stamp):
+        """(измененные id, удаленные id) с меткой больше stamp или None"""
+        if stamp is None or self.floor is None or stamp < self.floor:
+            return None
+        changed, deleted = [], []
+        for entry_stamp, record_id in self._log[bisect_right(self._log, (stamp, float('inf'))):]:
+            if self._stamps.get(record_id) != entry_stamp:
+                continue
+            if record_id in self._deleted:
+                deleted.append(record_id)
+            else:
+                changed.append(record_id)
+        return changed, deleted
@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from storage import JsonStore
+from sync_index import ModificationIndex
+
+
+def student(record_id, updated_at):
+    return {"id": record_id, "name": f"Студент {record_id}", "updatedAt": updated_at}
+
+
+class RestartWithJournalTest(unittest.TestCase):
+    """Удаление до перезапуска не должно теряться в ответе ?since="""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'students.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def open_store(self):
+        store = JsonStore(self.filename, journal=True)
+        index = ModificationIndex()
+        store.add_index(index)
+        store.load()
+        index.mark_loaded()
+        return store, index
+
+    def test_changes_before_restart_need_full_reload(self):
+        store, _ = self.open_store()
+        store.save([student(1, '2025-01-01T10:00:00'), student(5, '2025-01-01T11:00:00')])
+        store.delete(5)
+        store.compact()
+        # После сжатия журнал не пустой: при загрузке сработает update(), а не только rebuild()
+        store.put(student(1, '2025-01-02T10:00:00'))
+
+        _, index = self.open_store()
+        self.assertIsNone(index.changes_since('2020-01-01T00:00:00.000000'))
+        self.assertIsNone(index.changes_since('2025-01-01T12:00:00.000000'))
+
+    def test_changes_after_restart_are_delta(self):
+        store, _ = self.open_store()
+        store.save([student(1, '2025-01-01T10:00:00'), student(5, '2025-01-01T11:00:00')])
+        store.put(student(1, '2025-01-02T10:00:00'))
+
+        store, index = self.open_store()
+        loaded_at = index.high_water
+        store.delete(5)
+        self.assertEqual(index.changes_since(loaded_at), ([], [5]))
+
+
+if __name__ == '__main__':
+    unittest.main()